@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import argparse
+import logging
+
+import tagrss
+
+logging.basicConfig(
+    format='%(levelname)s:%(name)s:"%(asctime)s":%(message)s',
+    datefmt="%Y-%m-%d %H:%M:%S %z",
+    level=logging.INFO,
+)
+
+parser = argparse.ArgumentParser(
+    description="Back up a TagRSS database without stopping the service."
+)
+parser.add_argument("--storage-path", required=True)
+parser.add_argument("--backup-dir", required=True)
+parser.add_argument("--compress", action="store_true", help="Compress with gzip.")
+parser.add_argument(
+    "--keep", default=None, type=int, help="Delete all but this many newest backups."
+)
+args = parser.parse_args()
+if args.keep is not None and args.keep < 1:
+    parser.error("--keep must be at least 1.")
+
+core = tagrss.TagRss(storage_path=args.storage_path)
+try:
+    result = core.backup(args.backup_dir, compress=args.compress, keep=args.keep)
+finally:
+    core.close()
+logging.info(
+    f"Backed up to {result.path} in {result.seconds_total:.3f}s, blocking other "
+    f"users of the storage for {result.seconds_blocking:.3f}s."
+)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+# Measures the memory allocated (with tracemalloc) and time taken by the read
+# path used to render the index page: one get_entries() call plus get_feeds()
+# with tags for the feeds those entries belong to.
+#
+# To compare two revisions, check one out elsewhere and point --tagrss-dir at it:
+#   git worktree add /tmp/tagrss-before <revision>
+#   bench/row_allocations.py --tagrss-dir /tmp/tagrss-before
+#   bench/row_allocations.py
+import feedparser
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--tagrss-dir",
+    default=pathlib.Path(__file__).resolve().parent.parent,
+    type=pathlib.Path,
+    help="Directory containing the tagrss.py to measure.",
+)
+parser.add_argument("--feeds", default=50, type=int)
+parser.add_argument("--entries", default=20000, type=int)
+parser.add_argument("--limit", default=1000, type=int)
+parser.add_argument("--iterations", default=200, type=int)
+args = parser.parse_args()
+
+# Older revisions find their SQL scripts relative to the working directory.
+os.chdir(args.tagrss_dir)
+sys.path.insert(0, str(args.tagrss_dir))
+import tagrss  # noqa: E402
+
+with tempfile.TemporaryDirectory() as temp_dir:
+    storage = tagrss.SqliteStorageProvider(pathlib.Path(temp_dir) / "bench.db")
+    feed_ids = [
+        storage.store_feed(
+            source=f"https://example.com/{i}",
+            title=f"Feed {i}",
+            tags=[f"tag{i % 5}", "all", "with space"],
+        )
+        for i in range(args.feeds)
+    ]
+    for i, feed_id in enumerate(feed_ids):
+        parsed = feedparser.FeedParserDict(
+            entries=[
+                feedparser.FeedParserDict(
+                    title=f"Entry {j}", link=f"https://example.com/{i}/{j}"
+                )
+                for j in range(args.entries // args.feeds)
+            ]
+        )
+        storage.store_entries(parsed=parsed, feed_id=feed_id, epoch_downloaded=0)
+
+    def read():
+        entries = storage.get_entries(limit=args.limit)
+        feeds = storage.get_feeds(
+            limit=args.feeds,
+            included_feeds=list({entry.feed_id for entry in entries}),
+            get_tags=True,
+        )
+        return entries, feeds
+
+    read()  # Warm up caches (statement cache, etc.) first.
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = read()
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    blocks = sum(
+        stat.count_diff
+        for stat in tracemalloc.take_snapshot().compare_to(before, "filename")
+    )
+    tracemalloc.stop()
+    del result
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        read()
+    elapsed = time.perf_counter() - start
+
+    storage.close()
+
+print(f"tagrss: {args.tagrss_dir}")
+print(f"retained blocks: {blocks}")
+print(f"retained bytes: {retained_bytes}")
+print(f"peak bytes: {peak_bytes}")
+print(f"time per read: {elapsed / args.iterations * 1000:.3f} ms")
@@ -3,15 +3,8 @@
  Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
  the root of this repository for the text of the license.
  */
-PRAGMA foreign_keys = ON;
-
 CREATE TABLE IF NOT EXISTS tagrss_info(info_key TEXT PRIMARY KEY, value TEXT) STRICT;
 
-INSERT
-    OR REPLACE INTO tagrss_info(info_key, value)
-VALUES
-    ("version", "0.12.0");
-
 CREATE TABLE IF NOT EXISTS feed_count(
     id INTEGER PRIMARY KEY CHECK (id = 0),
     count INTEGER CHECK(count >= 0)
@@ -126,4 +119,4 @@ UPDATE
 SET
     count = count - 1;
 
-END;
\ No newline at end of file
+END;
@@ -0,0 +1,14 @@
+/*
+ Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+ Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+ the root of this repository for the text of the license.
+ */
+CREATE TABLE IF NOT EXISTS websub_subscriptions(
+    feed_id INTEGER PRIMARY KEY REFERENCES feeds(id) ON DELETE CASCADE,
+    hub TEXT,
+    topic TEXT,
+    secret TEXT,
+    epoch_expires INTEGER
+) STRICT;
+
+CREATE INDEX IF NOT EXISTS idx_websub_subscriptions__epoch_expires ON websub_subscriptions(epoch_expires);
@@ -0,0 +1,56 @@
+/*
+ Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+ Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+ the root of this repository for the text of the license.
+ */
+CREATE TABLE IF NOT EXISTS entries_archive(
+    id INTEGER PRIMARY KEY,
+    feed_id INTEGER REFERENCES feeds(id) ON DELETE CASCADE,
+    title TEXT,
+    link TEXT,
+    epoch_published INTEGER,
+    epoch_updated INTEGER,
+    epoch_downloaded INTEGER
+) STRICT;
+
+CREATE TRIGGER IF NOT EXISTS trig_entries__ensure_unique_against_archive_before_insert BEFORE
+INSERT
+    ON entries BEGIN
+SELECT
+    RAISE(IGNORE)
+WHERE
+    EXISTS (
+        SELECT
+            1
+        FROM
+            entries_archive
+        WHERE
+            feed_id = NEW.feed_id
+            AND link IS NEW.link
+            AND title IS NEW.title
+            AND epoch_published IS NEW.epoch_published
+            AND epoch_updated IS NEW.epoch_updated
+    );
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_entries_archive__increment_entry_count_after_insert
+AFTER
+INSERT
+    ON entries_archive BEGIN
+UPDATE
+    entry_count
+SET
+    count = count + 1;
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_entries_archive__decrement_entry_count_after_delete
+AFTER
+    DELETE ON entries_archive BEGIN
+UPDATE
+    entry_count
+SET
+    count = count - 1;
+
+END;
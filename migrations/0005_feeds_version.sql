@@ -0,0 +1,67 @@
+/*
+ Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+ Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+ the root of this repository for the text of the license.
+ */
+CREATE TABLE IF NOT EXISTS feeds_version(
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER
+) STRICT;
+
+INSERT
+    OR IGNORE INTO feeds_version(id, version)
+VALUES
+    (0, 0);
+
+CREATE TRIGGER IF NOT EXISTS trig_feeds__increment_feeds_version_after_insert
+AFTER
+INSERT
+    ON feeds BEGIN
+UPDATE
+    feeds_version
+SET
+    version = version + 1;
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_feeds__increment_feeds_version_after_update
+AFTER
+UPDATE
+    ON feeds BEGIN
+UPDATE
+    feeds_version
+SET
+    version = version + 1;
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_feeds__increment_feeds_version_after_delete
+AFTER
+    DELETE ON feeds BEGIN
+UPDATE
+    feeds_version
+SET
+    version = version + 1;
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_feed_tags__increment_feeds_version_after_insert
+AFTER
+INSERT
+    ON feed_tags BEGIN
+UPDATE
+    feeds_version
+SET
+    version = version + 1;
+
+END;
+
+CREATE TRIGGER IF NOT EXISTS trig_feed_tags__increment_feeds_version_after_delete
+AFTER
+    DELETE ON feed_tags BEGIN
+UPDATE
+    feeds_version
+SET
+    version = version + 1;
+
+END;
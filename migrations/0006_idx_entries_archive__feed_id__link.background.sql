@@ -0,0 +1,6 @@
+/*
+ Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+ Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+ the root of this repository for the text of the license.
+ */
+CREATE INDEX IF NOT EXISTS idx_entries_archive__feed_id__link ON entries_archive(feed_id, link);
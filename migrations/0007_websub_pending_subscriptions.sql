@@ -0,0 +1,9 @@
+/*
+ Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+ Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+ the root of this repository for the text of the license.
+ */
+CREATE TABLE IF NOT EXISTS websub_pending_subscriptions(
+    feed_id INTEGER PRIMARY KEY REFERENCES websub_subscriptions(feed_id) ON DELETE CASCADE,
+    epoch_pending_until INTEGER
+) STRICT;
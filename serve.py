@@ -8,9 +8,14 @@ import bottle
 import schedule
 
 import argparse
+import functools
+import json
 import logging
 import math
+import os
 import pathlib
+import signal
+import sys
 import threading
 import time
 import typing
@@ -19,8 +24,16 @@ import tagrss
 
 MAX_PER_PAGE_ENTRIES = 1000
 DEFAULT_PER_PAGE_ENTRIES = 50
+INDEX_RENDER_SLICE_SIZE = 100
+API_BATCH_SIZE = 500
 MAX_TAGS = 100
 MAX_TAG_LENGTH = 200
+WEBSUB_RENEW_CHECK_SECONDS = 60 * 60
+WEBSUB_RENEW_MARGIN_SECONDS = 24 * 60 * 60
+ARCHIVE_CHECK_SECONDS = 24 * 60 * 60
+# With several web processes, each checks this often whether another changed the
+# feeds it has cached.
+FEED_CACHE_CHECK_SECONDS = 1
 
 logging.basicConfig(
     format='%(levelname)s:%(name)s:"%(asctime)s":%(message)s',
@@ -31,13 +44,108 @@ logging.basicConfig(
 parser = argparse.ArgumentParser()
 parser.add_argument("--host", default="localhost")
 parser.add_argument("--port", default=8000, type=int)
-parser.add_argument("--storage-path", required=True)
+parser.add_argument("--storage-path")
+parser.add_argument(
+    "--storage-backend",
+    choices=("sqlite", "memory"),
+    default="sqlite",
+    help="memory keeps everything in memory and loses it on exit; it is meant for "
+    "testing and benchmarking.",
+)
 parser.add_argument("--update-seconds", default=3600, type=int)
+parser.add_argument(
+    "--websub-callback-base",
+    default=None,
+    help="Public base URL of this instance (e.g. https://rss.example.com). If "
+    "given, feeds that advertise a WebSub hub are subscribed to for push updates.",
+)
+parser.add_argument(
+    "--websub-poll-seconds",
+    default=24 * 60 * 60,
+    type=int,
+    help="How often to poll feeds that have an active WebSub subscription anyway.",
+)
+parser.add_argument(
+    "--archive-after-days",
+    default=None,
+    type=int,
+    help="If given, entries downloaded more than this many days ago are moved to "
+    "the archive tier, which keeps the tables used by the newest entries small.",
+)
+parser.add_argument(
+    "--backup-dir",
+    default=None,
+    help="If given, backups can be made from /backup and are written here.",
+)
+parser.add_argument("--backup-compress", action="store_true")
+parser.add_argument(
+    "--backup-keep", default=None, type=int, help="Number of newest backups to keep."
+)
+parser.add_argument(
+    "--server-threads",
+    default=10,
+    type=int,
+    help="Number of threads handling requests in each web process.",
+)
+parser.add_argument(
+    "--web-processes",
+    default=1,
+    type=int,
+    help="If more than 1, this many web processes are forked, each with its own "
+    "storage connection, to serve requests on multiple cores. Feeds are still "
+    "updated by the main process only. Requires SO_REUSEPORT (e.g. Linux).",
+)
 args = parser.parse_args()
+if args.storage_backend == "sqlite" and not args.storage_path:
+    parser.error("--storage-path is required with the sqlite storage backend.")
+if args.backup_keep is not None and args.backup_keep < 1:
+    parser.error("--backup-keep must be at least 1.")
+if args.server_threads < 1:
+    parser.error("--server-threads must be at least 1.")
+if args.web_processes < 1:
+    parser.error("--web-processes must be at least 1.")
+if args.web_processes > 1 and args.storage_backend != "sqlite":
+    parser.error("--web-processes can only be used with the sqlite storage backend.")
+if args.backup_dir and args.storage_backend != "sqlite":
+    parser.error("--backup-dir can only be used with the sqlite storage backend.")
+
+
+def open_core(
+    *,
+    feed_cache_seconds: typing.Optional[float] = None,
+    apply_background_migrations: bool = True,
+) -> tagrss.TagRss:
+    if args.storage_backend == "memory":
+        return tagrss.TagRss(
+            storage_provider=tagrss.MemoryStorageProvider(),
+            websub_callback_base=args.websub_callback_base,
+        )
+    return tagrss.TagRss(
+        storage_provider=tagrss.SqliteStorageProvider(
+            pathlib.Path(args.storage_path),
+            apply_background_migrations=apply_background_migrations,
+        ),
+        websub_callback_base=args.websub_callback_base,
+        feed_cache_seconds=feed_cache_seconds,
+    )
+
+
+def storage_busy_as_503(callback):
+    # Writes give up with StorageBusyError if another connection (e.g. a
+    # background migration) keeps the write lock for too long.
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        try:
+            return callback(*args, **kwargs)
+        except tagrss.StorageBusyError:
+            raise bottle.HTTPError(
+                503, "Storage is busy (migration in progress?); try again later."
+            )
 
-storage_path: pathlib.Path = pathlib.Path(args.storage_path)
+    return wrapper
 
-core = tagrss.TagRss(storage_path=storage_path)
+
+bottle.install(storage_busy_as_503)
 
 
 def forgiving_parse_int(inp, default: int) -> int:
@@ -92,17 +200,12 @@ def validate_tags(tags: list[str]) -> typing.Optional[bottle.HTTPError]:
                 )
 
 
-@bottle.get("/")
-def index():
-    per_page: int = min(
-        MAX_PER_PAGE_ENTRIES,
-        forgiving_parse_int(
-            bottle.request.query.get("per_page"),  # type: ignore
-            DEFAULT_PER_PAGE_ENTRIES,
-        ),
-    )
-    page_num = forgiving_parse_int(bottle.request.query.get("page_num"), 1)  # type: ignore
-    offset = (page_num - 1) * per_page
+def parse_entry_filters() -> tuple[
+    typing.Optional[str],
+    typing.Optional[list[int]],
+    typing.Optional[str],
+    typing.Optional[list[str]],
+]:
     included_feeds_str: typing.Optional[str] = bottle.request.query.get(  # type: ignore
         "included_feeds", None
     )
@@ -118,45 +221,119 @@ def index():
     included_tags: typing.Optional[list[str]] = None
     if included_tags_str:
         included_tags = parse_space_separated_tags(included_tags_str)
-    total_pages: int = max(
-        1,
-        math.ceil(
-            core.get_entry_count(
-                included_feeds=included_feeds, included_tags=included_tags
-            )
-            / per_page
+    return (included_feeds_str, included_feeds, included_tags_str, included_tags)
+
+
+@bottle.get("/")
+def index():
+    per_page: int = min(
+        MAX_PER_PAGE_ENTRIES,
+        forgiving_parse_int(
+            bottle.request.query.get("per_page"),  # type: ignore
+            DEFAULT_PER_PAGE_ENTRIES,
         ),
     )
-    entries = core.get_entries(
-        limit=per_page,
-        offset=offset,
-        included_feeds=included_feeds,
-        included_tags=included_tags,
-    )
-    referenced_feed_ids = list({entry.feed_id for entry in entries})
-    referenced_feeds_list = core.get_feeds(
-        limit=len(referenced_feed_ids),
-        included_feeds=referenced_feed_ids,
-        get_tags=True,
-    )
-    referenced_feeds = {}
-    for feed in referenced_feeds_list:
-        referenced_feeds[feed.id] = feed
-    return bottle.template(
-        "index",
-        entries=entries,
-        offset=offset,
+    page_num = forgiving_parse_int(bottle.request.query.get("page_num"), 1)  # type: ignore
+    offset = (page_num - 1) * per_page
+    (
+        included_feeds_str,
+        included_feeds,
+        included_tags_str,
+        included_tags,
+    ) = parse_entry_filters()
+    template_args = dict(
         page_num=page_num,
-        total_pages=total_pages,
         per_page=per_page,
         max_per_page=MAX_PER_PAGE_ENTRIES,
         included_feeds=included_feeds,
         included_tags=included_tags,
         included_feeds_str=included_feeds_str,
         included_tags_str=included_tags_str,
-        referenced_feeds=referenced_feeds,
     )
 
+    # The page is streamed: the header goes out before anything is queried. The
+    # page's entries are then read with one query (batching it would make SQLite
+    # sort a filtered set again for every batch) and sent a slice at a time as
+    # they are rendered. Only the footer needs the total count, so it is taken
+    # last.
+    def render():
+        yield bottle.template("index_header", **template_args)
+        entries = core.get_entries(
+            limit=per_page,
+            offset=offset,
+            included_feeds=included_feeds,
+            included_tags=included_tags,
+        )
+        referenced_feeds: dict[tagrss.FeedId, tagrss.Feed] = {}
+        for start in range(0, len(entries), INDEX_RENDER_SLICE_SIZE):
+            entries_slice = entries[start : start + INDEX_RENDER_SLICE_SIZE]
+            for entry in entries_slice:
+                if entry.feed_id not in referenced_feeds:
+                    referenced_feeds[entry.feed_id] = core.get_feed(entry.feed_id)
+            yield bottle.template(
+                "index_entries",
+                entries=entries_slice,
+                offset=offset + start,
+                referenced_feeds=referenced_feeds,
+            )
+        total_pages: int = max(
+            1,
+            math.ceil(
+                core.get_entry_count(
+                    included_feeds=included_feeds, included_tags=included_tags
+                )
+                / per_page
+            ),
+        )
+        yield bottle.template("index_footer", total_pages=total_pages, **template_args)
+
+    return render()
+
+
+@bottle.get("/api/entries")
+def api_entries():
+    # Streams every matching entry with an ID above since_id, oldest first, as
+    # NDJSON (the default) or as a JSON array with format=json.
+    since_id = forgiving_parse_int(bottle.request.query.get("since_id"), 0)  # type: ignore
+    _, included_feeds, _, included_tags = parse_entry_filters()
+    as_json_array = bottle.request.query.get("format") == "json"  # type: ignore
+    bottle.response.content_type = (
+        "application/json" if as_json_array else "application/x-ndjson"
+    )
+
+    def serialise(entry: tagrss.Entry) -> str:
+        return json.dumps(
+            {
+                "id": entry.id,
+                "feed_id": entry.feed_id,
+                "title": entry.title,
+                "link": entry.link,
+                "epoch_published": entry.epoch_published,
+                "epoch_updated": entry.epoch_updated,
+            },
+            ensure_ascii=False,
+        )
+
+    def render():
+        if as_json_array:
+            yield "["
+        first = True
+        for entries in core.iter_entries_since(
+            since_id=since_id,
+            included_feeds=included_feeds,
+            included_tags=included_tags,
+            batch_size=API_BATCH_SIZE,
+        ):
+            if as_json_array:
+                yield ("" if first else ",") + ",".join(map(serialise, entries))
+            else:
+                yield "".join(serialise(entry) + "\n" for entry in entries)
+            first = False
+        if as_json_array:
+            yield "]"
+
+    return render()
+
 
 @bottle.get("/list_feeds")
 def list_feeds():
@@ -252,15 +429,10 @@ def manage_feed_view():
     except ValueError:
         raise bottle.HTTPError(400, f'"{feed_id_raw}" is not a valid feed ID.')
     try:
-        feed = tagrss.Feed(
-            id=feed_id,
-            source=core.get_feed_source(feed_id),
-            title=core.get_feed_title(feed_id),
-        )
+        feed = core.get_feed(feed_id)
     except tagrss.FeedDoesNotExistError:
         raise bottle.HTTPError(404, f"No feed has ID {feed_id}.")
-    feed.tags = core.get_feed_tags(feed_id)
-    serialised_tags = serialise_tags(feed.tags)
+    serialised_tags = serialise_tags(core.get_feed_tags(feed_id))
     return bottle.template("manage_feed", feed=feed, serialised_tags=serialised_tags)
 
 
@@ -307,19 +479,97 @@ def delete_feed():
     return bottle.template("delete_feed")
 
 
+@bottle.get("/backup")
+def backup_view():
+    if not args.backup_dir:
+        raise bottle.HTTPError(404, "Backups are not enabled.")
+    return bottle.template(
+        "backup", backup_dir=args.backup_dir, backup_compress=args.backup_compress
+    )
+
+
+@bottle.post("/backup")
+def backup_effect():
+    if not args.backup_dir:
+        raise bottle.HTTPError(404, "Backups are not enabled.")
+    compress = bool(bottle.request.forms.get("compress"))  # type: ignore
+    result = core.backup(args.backup_dir, compress=compress, keep=args.backup_keep)
+    logging.info(
+        f"Backed up to {result.path} in {result.seconds_total:.3f}s, blocking other "
+        f"users of the storage for {result.seconds_blocking:.3f}s."
+    )
+    return bottle.template(
+        "backup", backup_dir=args.backup_dir, backup_compress=compress, result=result
+    )
+
+
+@bottle.get("/websub/<feed_id:int>")
+def websub_verify(feed_id: int):
+    mode: str = bottle.request.query.get("hub.mode", "")  # type: ignore
+    topic: str = bottle.request.query.get("hub.topic", "")  # type: ignore
+    challenge: str = bottle.request.query.get("hub.challenge", "")  # type: ignore
+    lease_seconds_raw = bottle.request.query.get("hub.lease_seconds")  # type: ignore
+    lease_seconds = (
+        forgiving_parse_int(lease_seconds_raw, 0) if lease_seconds_raw else None
+    )
+    if not core.verify_websub_intent(
+        feed_id, mode=mode, topic=topic, lease_seconds=lease_seconds
+    ):
+        raise bottle.HTTPError(404, "No matching subscription.")
+    logging.info(f"Verified WebSub {mode} for feed {feed_id}.")
+    bottle.response.content_type = "text/plain"
+    return challenge
+
+
+@bottle.post("/websub/<feed_id:int>")
+def websub_receive(feed_id: int):
+    try:
+        accepted = core.store_websub_content(
+            feed_id,
+            bottle.request.body.read(),  # type: ignore
+            signature=bottle.request.get_header("X-Hub-Signature"),
+            content_type=bottle.request.get_header("Content-Type"),
+        )
+    except tagrss.WebSubSubscriptionDoesNotExistError:
+        raise bottle.HTTPError(410, "No subscription for this feed.")
+    except tagrss.NotAFeedError:
+        logging.warning(f"WebSub content for feed {feed_id} was not a valid feed.")
+    except tagrss.StorageConstraintViolationError:
+        logging.warning(
+            f"Failed to store WebSub content for feed {feed_id} due to constraint "
+            "violation (feed already deleted?)."
+        )
+    else:
+        if accepted:
+            logging.debug(f"Stored WebSub content for feed {feed_id}.")
+        else:
+            logging.warning(
+                f"Ignored WebSub content for feed {feed_id} with a missing or bad "
+                "signature."
+            )
+    bottle.response.status = 204
+
+
 @bottle.get("/static/<path:path>")
 def serve_static(path):
     return bottle.static_file(path, "static")
 
 
 def update_feeds(run_event: threading.Event):
-    def inner_update():
+    def inner_update(*, include_websub_subscribed: bool = True):
         logging.info("Updating all feeds...")
+        skipped_feed_ids = (
+            set()
+            if include_websub_subscribed
+            else core.get_websub_subscribed_feed_ids()
+        )
         limit = 100
         feed_count = core.get_feed_count()
         for i in range(math.ceil(feed_count / limit)):
             feeds = core.get_feeds(limit=limit, offset=limit * i)
             for feed in feeds:
+                if feed.id in skipped_feed_ids:
+                    continue
                 try:
                     core.update_feed(feed.id)
                 except (tagrss.FeedFetchError, tagrss.NotAFeedError) as e:
@@ -332,22 +582,154 @@ def update_feeds(run_event: threading.Event):
                         f"Failed to update feed {feed.id} with source {feed.source} due"
                         "to constraint violation (feed already deleted?)."
                     )
+                except tagrss.StorageBusyError:
+                    logging.warning(
+                        f"Failed to update feed {feed.id} with source {feed.source} as "
+                        "the storage was busy (migration in progress?); it will be "
+                        "retried on the next update."
+                    )
                 else:
                     logging.debug(f"Updated feed {feed.id} (source {feed.source}).")
         logging.info("Finished updating all feeds.")
 
+    def archive_entries():
+        logging.info("Archiving old entries...")
+        moved = core.archive_entries(
+            older_than_seconds=args.archive_after_days * 24 * 60 * 60
+        )
+        logging.info(f"Archived {moved} entries.")
+
+    def catching_exceptions(job):
+        # An exception escaping a job would end this thread, and with it all
+        # further updates.
+        def wrapper(*args, **kwargs):
+            try:
+                job(*args, **kwargs)
+            except Exception:
+                logging.exception(f"{job.__name__} failed; will retry on next run.")
+
+        return wrapper
+
+    inner_update = catching_exceptions(inner_update)
+    archive_entries = catching_exceptions(archive_entries)
+
     inner_update()
-    schedule.every(args.update_seconds).seconds.do(inner_update)
+    if args.archive_after_days is not None:
+        archive_entries()
+        schedule.every(ARCHIVE_CHECK_SECONDS).seconds.do(archive_entries)
+    if args.websub_callback_base:
+        # Feeds with an active subscription get pushed new entries, so they are
+        # only polled occasionally as a safety net.
+        schedule.every(args.update_seconds).seconds.do(
+            inner_update, include_websub_subscribed=False
+        )
+        schedule.every(args.websub_poll_seconds).seconds.do(inner_update)
+        schedule.every(WEBSUB_RENEW_CHECK_SECONDS).seconds.do(
+            catching_exceptions(core.renew_websub_subscriptions),
+            margin_seconds=WEBSUB_RENEW_MARGIN_SECONDS,
+        )
+    else:
+        schedule.every(args.update_seconds).seconds.do(inner_update)
     while run_event.is_set():
         schedule.run_pending()
         time.sleep(1)
 
 
-feed_update_run_event = threading.Event()
-feed_update_run_event.set()
-threading.Thread(target=update_feeds, args=(feed_update_run_event,)).start()
+def run_server(**options) -> None:
+    bottle.run(
+        host=args.host,
+        port=args.port,
+        server="cheroot",
+        numthreads=args.server_threads,
+        **options,
+    )
+
 
-bottle.run(host=args.host, port=args.port, server="cheroot")
-logging.info("Exiting...")
-feed_update_run_event.clear()
-core.close()
+def run_web_worker() -> typing.NoReturn:
+    global core
+    status = 0
+    try:
+        # Background migrations are left to the main process.
+        core = open_core(
+            feed_cache_seconds=FEED_CACHE_CHECK_SECONDS,
+            apply_background_migrations=False,
+        )
+        try:
+            # Each worker has its own listening socket on the same port, and the
+            # kernel spreads connections between them.
+            run_server(reuse_port=True)
+        finally:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            core.close()
+    except BaseException:
+        logging.exception(f"Web worker {os.getpid()} failed.")
+        status = 1
+    finally:
+        logging.shutdown()
+        # Don't fall back into the parent's code.
+        os._exit(status)
+
+
+def run_with_web_workers() -> None:
+    global core
+    # Run foreground migrations before forking so the workers don't race to do
+    # so. Nothing may hold a storage connection or have started a thread yet when
+    # forking, so background migrations are only started afterwards, by the core
+    # this process opens.
+    tagrss.SqliteStorageProvider(
+        pathlib.Path(args.storage_path), apply_background_migrations=False
+    ).close()
+
+    # SIGTERM is handled like SIGINT, so that bottle.run() returns and cheroot
+    # finishes the requests in progress before a worker exits.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    workers: set[int] = set()
+    for _ in range(args.web_processes):
+        pid = os.fork()
+        if pid == 0:
+            run_web_worker()
+        workers.add(pid)
+    logging.info(f"Started {len(workers)} web workers: {sorted(workers)}.")
+
+    core = open_core(feed_cache_seconds=FEED_CACHE_CHECK_SECONDS)
+    feed_update_run_event = threading.Event()
+    feed_update_run_event.set()
+    threading.Thread(target=update_feeds, args=(feed_update_run_event,)).start()
+    worker_failed = False
+    try:
+        pid, status = os.wait()
+        workers.discard(pid)
+        worker_failed = True
+        logging.error(
+            f"Web worker {pid} exited unexpectedly (exit code "
+            f"{os.waitstatus_to_exitcode(status)}); shutting down."
+        )
+    except KeyboardInterrupt:
+        pass
+    logging.info("Exiting...")
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        os.waitpid(pid, 0)
+    feed_update_run_event.clear()
+    core.close()
+    if worker_failed:
+        sys.exit(1)
+
+
+if args.web_processes > 1:
+    run_with_web_workers()
+else:
+    core = open_core()
+    feed_update_run_event = threading.Event()
+    feed_update_run_event.set()
+    threading.Thread(target=update_feeds, args=(feed_update_run_event,)).start()
+
+    run_server()
+    logging.info("Exiting...")
+    feed_update_run_event.clear()
+    core.close()
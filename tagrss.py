@@ -7,11 +7,22 @@ import feedparser
 import requests
 
 import abc
+import array
+import bisect
 import calendar
 import contextlib
 import dataclasses
+import gzip
+import hashlib
+import heapq
+import hmac
 import io
+import itertools
+import json
 import pathlib
+import re
+import secrets
+import shutil
 import sqlite3
 import threading
 import time
@@ -34,6 +45,10 @@ class StorageConstraintViolationError(StorageError):
     pass
 
 
+class StorageBusyError(StorageError):
+    pass
+
+
 class SqliteMissingForeignKeySupportError(StorageError):
     pass
 
@@ -63,12 +78,20 @@ class NotAFeedError(Exception):
     pass
 
 
+class WebSubSubscriptionDoesNotExistError(Exception):
+    pass
+
+
+BACKUP_PREFIX = "tagrss-backup-"
+# How long after asking a hub to (re)subscribe we accept its verification.
+WEBSUB_VERIFICATION_WINDOW_SECONDS = 24 * 60 * 60
+
 FeedId = int
 Epoch = int
 ParsedFeed = feedparser.FeedParserDict
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class Feed:
     id: FeedId
     source: str
@@ -76,7 +99,7 @@ class Feed:
     tags: typing.Optional[list[str]] = None
 
 
-@dataclasses.dataclass(kw_only=True)
+@dataclasses.dataclass(kw_only=True, slots=True)
 class Entry:
     id: int
     feed_id: FeedId
@@ -86,33 +109,404 @@ class Entry:
     epoch_updated: Epoch
 
 
+@dataclasses.dataclass(kw_only=True, slots=True)
+class WebSubSubscription:
+    feed_id: FeedId
+    hub: str
+    topic: str
+    secret: str
+    # None until the hub has verified the subscription.
+    epoch_expires: typing.Optional[Epoch] = None
+    # Set while we have asked the hub to (re)subscribe and are waiting for it to
+    # verify that; only then is a verification of the subscription accepted.
+    epoch_pending_until: typing.Optional[Epoch] = None
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
+class BackupResult:
+    path: pathlib.Path
+    seconds_total: float
+    # Time during which the backup held the storage lock, i.e. other users of
+    # the storage could not proceed.
+    seconds_blocking: float
+
+
+EntryKey = tuple[
+    typing.Optional[str],
+    typing.Optional[str],
+    typing.Optional[Epoch],
+    typing.Optional[Epoch],
+]
+
+
+def _get_entry_key(entry: feedparser.FeedParserDict) -> EntryKey:
+    # The fields that are stored for an entry, which are also the ones two
+    # entries of a feed must differ in to both be stored.
+    title: typing.Optional[str] = entry.get("title", None)  # type: ignore
+    link: typing.Optional[str] = entry.get("link", None)  # type: ignore
+    try:
+        epoch_published: typing.Optional[Epoch] = calendar.timegm(
+            entry.get("published_parsed", None)  # type: ignore
+        )
+    except TypeError:
+        epoch_published = None
+    try:
+        epoch_updated: typing.Optional[Epoch] = calendar.timegm(
+            entry.get("updated_parsed", None)  # type: ignore
+        )
+    except TypeError:
+        epoch_updated = None
+    return (title, link, epoch_published, epoch_updated)
+
+
+_T = typing.TypeVar("_T")
+
+
+def _paginate(items: typing.Iterable[_T], *, limit: int, offset: int) -> list[_T]:
+    # Like LIMIT/OFFSET in SQLite: a negative offset counts as 0 and a negative
+    # limit means no limit.
+    offset = max(0, offset)
+    return list(itertools.islice(items, offset, offset + limit if limit >= 0 else None))
+
+
+def _feed_row_factory(_cursor: sqlite3.Cursor, row: tuple) -> Feed:
+    return Feed(id=row[0], source=row[1], title=row[2])
+
+
+def _feed_with_tags_row_factory(_cursor: sqlite3.Cursor, row: tuple) -> Feed:
+    return Feed(id=row[0], source=row[1], title=row[2], tags=json.loads(row[3]))
+
+
+def _entry_row_factory(_cursor: sqlite3.Cursor, row: tuple) -> Entry:
+    return Entry(
+        id=row[0],
+        feed_id=row[1],
+        title=row[2],
+        link=row[3],
+        epoch_published=row[4],
+        epoch_updated=row[5],
+    )
+
+
 class StorageProvider(abc.ABC):
-    pass
+    @abc.abstractmethod
+    def store_feed(self, *, source: str, title: str, tags: list[str]) -> FeedId: ...
+
+    @abc.abstractmethod
+    def get_feeds(
+        self,
+        *,
+        limit: int,
+        offset: int = 0,
+        included_feeds: typing.Optional[list[FeedId]] = None,
+        included_tags: typing.Optional[list[str]] = None,
+        get_tags: bool = False,
+    ) -> list[Feed]: ...
+
+    @abc.abstractmethod
+    def get_feed_count(
+        self,
+        *,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+    ) -> int: ...
+
+    @abc.abstractmethod
+    def get_feed_source(self, feed_id: FeedId) -> str: ...
+
+    @abc.abstractmethod
+    def get_feed_title(self, feed_id: FeedId) -> str: ...
+
+    @abc.abstractmethod
+    def get_feed_tags(self, feed_id: FeedId) -> list[str]: ...
+
+    @abc.abstractmethod
+    def set_feed_source(self, feed_id: FeedId, feed_source: str) -> None: ...
+
+    @abc.abstractmethod
+    def set_feed_title(self, feed_id: FeedId, feed_title: str) -> None: ...
+
+    @abc.abstractmethod
+    def set_feed_tags(self, feed_id: FeedId, feed_tags: list[str]) -> None: ...
+
+    @abc.abstractmethod
+    def delete_feed(self, feed_id: FeedId) -> None: ...
+
+    # Changes whenever any feed or its tags do, so that feed metadata held
+    # elsewhere (e.g. by another process using the same storage) can be checked
+    # for staleness cheaply.
+    @abc.abstractmethod
+    def get_feeds_version(self) -> int: ...
+
+    @abc.abstractmethod
+    def store_entries(
+        self,
+        *,
+        parsed: ParsedFeed,
+        feed_id: FeedId,
+        epoch_downloaded: Epoch,
+    ) -> None: ...
+
+    # Entries are returned newest first, except when after_id is given, in which
+    # case they are returned oldest first.
+    @abc.abstractmethod
+    def get_entries(
+        self,
+        *,
+        limit: int,
+        offset: int = 0,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+        before_id: typing.Optional[int] = None,
+        after_id: typing.Optional[int] = None,
+    ) -> list[Entry]: ...
+
+    @abc.abstractmethod
+    def get_entry_count(
+        self,
+        *,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+    ) -> int: ...
+
+    @abc.abstractmethod
+    def archive_entries(self, *, downloaded_before: Epoch, batch_size: int) -> int: ...
+
+    @abc.abstractmethod
+    def get_feed_content_hash(self, feed_id: FeedId) -> typing.Optional[bytes]: ...
+
+    @abc.abstractmethod
+    def set_feed_content_hash(self, feed_id: FeedId, content_hash: bytes) -> None: ...
+
+    @abc.abstractmethod
+    def store_websub_subscription(
+        self, *, feed_id: FeedId, hub: str, topic: str, secret: str
+    ) -> None: ...
+
+    @abc.abstractmethod
+    def get_websub_subscription(
+        self, feed_id: FeedId
+    ) -> typing.Optional[WebSubSubscription]: ...
+
+    @abc.abstractmethod
+    def get_websub_subscriptions_expiring_before(
+        self, epoch: Epoch
+    ) -> list[WebSubSubscription]: ...
+
+    @abc.abstractmethod
+    def get_websub_subscribed_feed_ids(self, *, active_at: Epoch) -> set[FeedId]: ...
+
+    @abc.abstractmethod
+    def set_websub_subscription_expiry(
+        self, feed_id: FeedId, epoch_expires: Epoch
+    ) -> None: ...
+
+    @abc.abstractmethod
+    def set_websub_subscription_pending(
+        self, feed_id: FeedId, epoch_pending_until: typing.Optional[Epoch]
+    ) -> None: ...
+
+    @abc.abstractmethod
+    def delete_websub_subscription(self, feed_id: FeedId) -> None: ...
+
+    def backup(
+        self,
+        target_path: str | pathlib.Path,
+        *,
+        pages_per_step: int,
+        pause_seconds: float,
+    ) -> float:
+        raise NotImplementedError(f"{type(self).__name__} does not support backups.")
+
+    @abc.abstractmethod
+    def close(self) -> None: ...
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
+class _Migration:
+    version: int
+    path: pathlib.Path
+    # Background migrations may only add things the application can do without,
+    # like indexes, so they can be applied while it is running, however long they
+    # take. Reads carry on meanwhile; writes wait for them (up to
+    # SQLITE_WRITE_WAIT_SECONDS, then StorageBusyError is raised) without holding
+    # up anything else.
+    background: bool
+
+
+MIGRATIONS_PATH = pathlib.Path(__file__).parent / "migrations"
+# How long SQLite itself waits for another connection's lock. It is kept short as
+# the provider's lock is held meanwhile; longer waits for the write lock are made
+# without it, up to SQLITE_WRITE_WAIT_SECONDS.
+SQLITE_BUSY_TIMEOUT_SECONDS = 0.1
+SQLITE_WRITE_WAIT_SECONDS = 60
+
+
+def _get_migrations() -> list[_Migration]:
+    migrations = []
+    for path in MIGRATIONS_PATH.iterdir():
+        match = re.fullmatch(r"(\d+)_.+?(\.background)?\.sql", path.name)
+        if match:
+            migrations.append(
+                _Migration(
+                    version=int(match[1]),
+                    path=path,
+                    background=bool(match[2]),
+                )
+            )
+    migrations.sort(key=lambda migration: migration.version)
+    return migrations
+
+
+def _apply_migration(
+    conn: sqlite3.Connection, migration: _Migration, *, record_version: bool = True
+) -> None:
+    with open(migration.path, "r") as script:
+        sql = script.read()
+    if record_version:
+        sql += (
+            "\nINSERT OR REPLACE INTO tagrss_info(info_key, value) "
+            f"VALUES('version', '{migration.version}');"
+        )
+    try:
+        conn.executescript(f"BEGIN IMMEDIATE;\n{sql}\nCOMMIT;")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK;")
+        raise e
+
+
+def _is_busy_error(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and e.sqlite_errorcode & 0xFF in (
+        sqlite3.SQLITE_BUSY,
+        sqlite3.SQLITE_LOCKED,
+    )
 
 
 class SqliteStorageProvider(StorageProvider):
-    def __init__(self, storage_path: str | pathlib.Path):
-        self.__raw_connection = sqlite3.connect(storage_path, check_same_thread=False)
+    def __init__(
+        self,
+        storage_path: str | pathlib.Path,
+        *,
+        apply_background_migrations: bool = True,
+    ):
+        # Until the foreground migrations are done nothing else can use the
+        # connection, so it may wait as long as writes do.
+        self.__raw_connection = sqlite3.connect(
+            storage_path, check_same_thread=False, timeout=SQLITE_WRITE_WAIT_SECONDS
+        )
         self.__raw_connection.isolation_level = None
 
         self.__lock = threading.Lock()
 
-        with self.__get_connection() as conn:
-            with open("setup.sql", "r") as setup_script:
-                conn.executescript(setup_script.read())
+        self.__storage_path = storage_path
+        self.__migration_thread: typing.Optional[threading.Thread] = None
+        self.__wal = False
+        with self.__get_connection(use_transaction=False) as conn:
+            if storage_path != ":memory:":
+                # Lets readers (e.g. other web processes) carry on while something
+                # is being written, and makes commits cheaper. This is stored in
+                # the database file, so it only has an effect the first time.
+                (journal_mode,) = conn.execute("PRAGMA journal_mode = WAL;").fetchone()
+                self.__wal = journal_mode == "wal"
+            conn.execute("PRAGMA foreign_keys = ON;")
             if (1,) not in conn.execute("PRAGMA foreign_keys;").fetchmany(1):
                 raise SqliteMissingForeignKeySupportError
+            version = self.__get_schema_version(conn)
+            migrations = [
+                migration
+                for migration in _get_migrations()
+                if migration.version > version
+            ]
+            if storage_path == ":memory:":
+                background_start = len(migrations)
+            else:
+                background_start = next(
+                    (i for i, m in enumerate(migrations) if m.background),
+                    len(migrations),
+                )
+            for migration in migrations[:background_start]:
+                _apply_migration(conn, migration)
+            # Nothing depends on what background migrations add, so the foreground
+            # ones after them are applied now too. The version only counts
+            # migrations applied in order, so these are applied again (which is
+            # harmless, as every migration is idempotent) after the background
+            # ones.
+            for migration in migrations[background_start:]:
+                if not migration.background:
+                    _apply_migration(conn, migration, record_version=False)
+            conn.execute(
+                f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_SECONDS * 1000)};"
+            )
+        if migrations[background_start:] and apply_background_migrations:
+            self.__migration_thread = threading.Thread(
+                target=self.__apply_background_migrations,
+                args=(storage_path, migrations[background_start:]),
+                daemon=True,
+            )
+            self.__migration_thread.start()
+
+    @staticmethod
+    def __get_schema_version(conn: sqlite3.Connection) -> int:
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = "
+            "'tagrss_info';"
+        ).fetchone():
+            return 0
+        row = conn.execute(
+            "SELECT value FROM tagrss_info WHERE info_key = 'version';"
+        ).fetchone()
+        try:
+            return int(row[0])
+        except (TypeError, ValueError):
+            # Versions from before migrations existed (e.g. "0.12.0"). Since every
+            # migration is idempotent, they can all safely be run again.
+            return 0
+
+    @staticmethod
+    def __apply_background_migrations(
+        storage_path: str | pathlib.Path, migrations: list[_Migration]
+    ) -> None:
+        conn = sqlite3.connect(storage_path, timeout=SQLITE_WRITE_WAIT_SECONDS)
+        conn.isolation_level = None
+        try:
+            for migration in migrations:
+                _apply_migration(conn, migration)
+        finally:
+            conn.close()
+
+    def wait_for_migrations(self) -> None:
+        if self.__migration_thread is not None:
+            self.__migration_thread.join()
 
     @contextlib.contextmanager
     def __get_connection(self, *, use_transaction: bool = True):
-        self.__lock.acquire()
+        deadline = time.monotonic() + SQLITE_WRITE_WAIT_SECONDS
+        while True:
+            self.__lock.acquire()
+            if not use_transaction:
+                break
+            try:
+                # Take the write lock up front: upgrading a read lock while another
+                # connection is writing fails without waiting.
+                self.__raw_connection.execute("BEGIN IMMEDIATE;")
+                break
+            except Exception as e:
+                self.__lock.release()
+                if not _is_busy_error(e):
+                    raise e
+                if time.monotonic() >= deadline:
+                    raise StorageBusyError(e)
+            # Another connection (e.g. a background migration) has the write lock.
+            # Wait for it without our lock, so readers can carry on meanwhile.
+            time.sleep(SQLITE_BUSY_TIMEOUT_SECONDS)
         try:
-            if use_transaction:
-                self.__raw_connection.execute("BEGIN;")
             yield self.__raw_connection
         except Exception as e:
             if use_transaction:
                 self.__raw_connection.rollback()
+            if _is_busy_error(e):
+                raise StorageBusyError(e)
             raise e
         else:
             if use_transaction:
@@ -170,12 +564,26 @@ class SqliteStorageProvider(StorageProvider):
         if included_feeds:
             where_clause += f" AND id IN ({','.join('?' * len(included_feeds))})"
         if included_tags:
-            where_clause += " AND id IN (SELECT id FROM feed_tags WHERE tag = ?)" * len(
-                included_tags
+            where_clause += (
+                " AND id IN (SELECT feed_id FROM feed_tags WHERE tag = ?)"
+                * len(included_tags)
             )
-        with self.__get_connection() as conn:
-            resp = conn.execute(
-                f"SELECT id, source, title FROM feeds \
+        # Tags are aggregated in the same statement so only one query is needed.
+        # JSON is used rather than group_concat() since tags may contain any
+        # separator character.
+        columns = "id, source, title"
+        if get_tags:
+            columns += (
+                ", (SELECT json_group_array(tag) FROM feed_tags "
+                "WHERE feed_id = feeds.id)"
+            )
+        with self.__get_connection(use_transaction=False) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = (
+                _feed_with_tags_row_factory if get_tags else _feed_row_factory
+            )
+            return cursor.execute(
+                f"SELECT {columns} FROM feeds \
                 {where_clause} \
                 ORDER BY id ASC LIMIT ? OFFSET ?;",
                 (
@@ -185,26 +593,6 @@ class SqliteStorageProvider(StorageProvider):
                     offset,
                 ),
             ).fetchall()
-        feeds_dict: dict[FeedId, Feed] = {}
-        for row in resp:
-            feeds_dict[row[0]] = Feed(id=row[0], source=row[1], title=row[2])
-        if get_tags:
-            feed_ids = feeds_dict.keys()
-            for feed_id in feed_ids:
-                feeds_dict[feed_id].tags = []
-            placeholder_str = ",".join("?" * len(feed_ids))
-            with self.__get_connection() as conn:
-                resp = conn.execute(
-                    "SELECT feed_id, tag FROM feed_tags WHERE feed_id in "
-                    f"({placeholder_str});",
-                    (*feed_ids,),
-                ).fetchall()
-            for row in resp:
-                try:
-                    feeds_dict[row[0]].tags.append(row[1])  # type: ignore
-                except AttributeError:
-                    feeds_dict[row[0]].tags = [row[1]]
-        return list(feeds_dict.values())
 
     def get_feed_count(
         self,
@@ -221,7 +609,7 @@ class SqliteStorageProvider(StorageProvider):
                 where_clause += f" AND id IN ({','.join('?' * len(included_feeds))})"
             if included_tags:
                 where_clause += (
-                    " AND id IN (SELECT id FROM feed_tags WHERE tag = ?)"
+                    " AND id IN (SELECT feed_id FROM feed_tags WHERE tag = ?)"
                     * len(included_tags)
                 )
             with self.__get_connection(use_transaction=False) as conn:
@@ -281,15 +669,22 @@ class SqliteStorageProvider(StorageProvider):
     def set_feed_tags(self, feed_id: FeedId, feed_tags: list[str]) -> None:
         with self.__get_connection() as conn:
             conn.execute("DELETE FROM feed_tags WHERE feed_id = ?;", (feed_id,))
-            conn.executemany(
-                "INSERT INTO feed_tags(feed_id, tag) VALUES(?, ?);",
-                ((feed_id, tag) for tag in feed_tags),
-            )
+            try:
+                conn.executemany(
+                    "INSERT INTO feed_tags(feed_id, tag) VALUES(?, ?);",
+                    ((feed_id, tag) for tag in feed_tags),
+                )
+            except sqlite3.IntegrityError as e:
+                raise StorageConstraintViolationError(e)
 
     def delete_feed(self, feed_id: FeedId) -> None:
         with self.__get_connection() as conn:
             conn.execute("DELETE FROM feeds WHERE id = ?;", (feed_id,))
 
+    def get_feeds_version(self) -> int:
+        with self.__get_connection(use_transaction=False) as conn:
+            return conn.execute("SELECT version FROM feeds_version;").fetchone()[0]
+
     def store_entries(
         self,
         *,
@@ -297,39 +692,24 @@ class SqliteStorageProvider(StorageProvider):
         feed_id: FeedId,
         epoch_downloaded: Epoch,
     ) -> None:
-        for entry in reversed(parsed.entries):
-            link: typing.Optional[str] = entry.get("link", None)  # type: ignore
-            title: typing.Optional[str] = entry.get("title", None)  # type: ignore
-            try:
-                epoch_published: typing.Optional[Epoch] = calendar.timegm(
-                    entry.get("published_parsed", None)  # type: ignore
-                )
-            except TypeError:
-                epoch_published = None
+        if not parsed.entries:
+            return
+        # One transaction for the whole feed, so there is only one commit to wait
+        # for (and to make other processes wait for).
+        with self.__get_connection() as conn:
             try:
-                epoch_updated: typing.Optional[Epoch] = calendar.timegm(
-                    entry.get("updated_parsed", None)  # type: ignore
+                conn.executemany(
+                    "INSERT INTO entries(feed_id, title, link, epoch_published, epoch_updated, epoch_downloaded) \
+                            VALUES(?, ?, ?, ?, ?, ?);",
+                    (
+                        (feed_id, *_get_entry_key(entry), epoch_downloaded)
+                        for entry in reversed(parsed.entries)
+                    ),
                 )
-            except TypeError:
-                epoch_updated = None
-            with self.__get_connection() as conn:
-                try:
-                    conn.execute(
-                        "INSERT INTO entries(feed_id, title, link, epoch_published, epoch_updated, epoch_downloaded) \
-                                VALUES(?, ?, ?, ?, ?, ?);",
-                        (
-                            feed_id,
-                            title,
-                            link,
-                            epoch_published,
-                            epoch_updated,
-                            epoch_downloaded,
-                        ),
-                    )
-                except sqlite3.IntegrityError as e:
-                    # Probably feed deleted before we got here, so foreign key
-                    # constraints would have been violated by the insert.
-                    raise StorageConstraintViolationError(e)
+            except sqlite3.IntegrityError as e:
+                # Probably feed deleted before we got here, so foreign key
+                # constraints would have been violated by the insert.
+                raise StorageConstraintViolationError(e)
 
     def get_entries(
         self,
@@ -338,8 +718,14 @@ class SqliteStorageProvider(StorageProvider):
         offset: int = 0,
         included_feeds: typing.Optional[typing.Collection[int]] = None,
         included_tags: typing.Optional[typing.Collection[str]] = None,
+        before_id: typing.Optional[int] = None,
+        after_id: typing.Optional[int] = None,
     ) -> list[Entry]:
         where_clause: str = "WHERE 1"
+        if before_id is not None:
+            where_clause += " AND id < ?"
+        if after_id is not None:
+            where_clause += " AND id > ?"
         if included_feeds:
             where_clause += f" AND feed_id IN ({','.join('?' * len(included_feeds))})"
         if included_tags:
@@ -347,31 +733,89 @@ class SqliteStorageProvider(StorageProvider):
                 " AND feed_id IN (SELECT feed_id FROM feed_tags WHERE tag = ?)"
                 * len(included_tags)
             )
+        params = (
+            *((before_id,) if before_id is not None else ()),
+            *((after_id,) if after_id is not None else ()),
+            *(included_feeds if included_feeds else ()),
+            *(included_tags if included_tags else ()),
+        )
+        columns = "id, feed_id, title, link, epoch_published, epoch_updated"
+        order = "ASC" if after_id is not None else "DESC"
         with self.__get_connection(use_transaction=False) as conn:
-            resp = conn.execute(
-                f"SELECT id, feed_id, title, link, epoch_published, epoch_updated FROM entries \
-                    {where_clause} \
+            if after_id is None and (included_feeds or included_tags):
+                return self.__get_filtered_entries_newest_first(
+                    conn,
+                    columns=columns,
+                    where_clause=where_clause,
+                    params=params,
+                    limit=limit,
+                    offset=offset,
+                )
+            # Unfiltered, both tiers are scanned in ID order and merged by SQLite,
+            # so the archive is only read once the page reaches past the newest
+            # entries. Oldest first (i.e. exporting), the feed_id indexes are kept
+            # out of it so that filtered reads are scanned in ID order too: SQLite
+            # would otherwise sort everything matching after after_id for every
+            # batch. This way each batch continues where the last one stopped.
+            indexed = " NOT INDEXED" if after_id is not None else ""
+            cursor = conn.cursor()
+            cursor.row_factory = _entry_row_factory
+            return cursor.execute(
+                f"SELECT {columns} FROM entries{indexed} {where_clause} \
+                    UNION ALL \
+                    SELECT {columns} FROM entries_archive{indexed} {where_clause} \
+                    ORDER BY id {order} LIMIT ? OFFSET ?;",
+                (*params, *params, limit, offset),
+            ).fetchall()
+
+    @staticmethod
+    def __get_filtered_entries_newest_first(
+        conn: sqlite3.Connection,
+        *,
+        columns: str,
+        where_clause: str,
+        params: tuple,
+        limit: int,
+        offset: int,
+    ) -> list[Entry]:
+        # Filtered, SQLite finds the matching entries through the feed_id indexes
+        # and has to sort them, which in one UNION ALL query would include every
+        # archived entry of those feeds. Since every archived ID is below every ID
+        # in entries, the newest entries can be read from entries alone, and the
+        # archive only needs to be read (and sorted) for the rest of a page that
+        # runs past them. Both reads share one snapshot so an archive pass in
+        # between can't show an entry twice.
+        cursor = conn.cursor()
+        cursor.row_factory = _entry_row_factory
+        conn.execute("BEGIN;")
+        try:
+            entries = cursor.execute(
+                f"SELECT {columns} FROM entries {where_clause} \
                     ORDER BY id DESC LIMIT ? OFFSET ?;",
-                (
-                    *(included_feeds if included_feeds else ()),
-                    *(included_tags if included_tags else ()),
-                    limit,
-                    offset,
-                ),
+                (*params, limit, offset),
             ).fetchall()
-        entries = []
-        for entry in resp:
-            entries.append(
-                Entry(
-                    id=entry[0],
-                    feed_id=entry[1],
-                    title=entry[2],
-                    link=entry[3],
-                    epoch_published=entry[4],
-                    epoch_updated=entry[5],
-                )
+            if limit >= 0 and len(entries) >= limit:
+                return entries
+            archive_offset = 0
+            if not entries and offset > 0:
+                (count,) = conn.execute(
+                    f"SELECT COUNT(*) FROM entries {where_clause};", params
+                ).fetchone()
+                archive_offset = max(0, offset - count)
+            return (
+                entries
+                + cursor.execute(
+                    f"SELECT {columns} FROM entries_archive {where_clause} \
+                    ORDER BY id DESC LIMIT ? OFFSET ?;",
+                    (
+                        *params,
+                        limit - len(entries) if limit >= 0 else -1,
+                        archive_offset,
+                    ),
+                ).fetchall()
             )
-        return entries
+        finally:
+            conn.execute("COMMIT;")
 
     def get_entry_count(
         self,
@@ -393,25 +837,598 @@ class SqliteStorageProvider(StorageProvider):
                     " AND feed_id IN (SELECT feed_id FROM feed_tags WHERE tag = ?)"
                     * len(included_tags)
                 )
+            params = (
+                *(included_feeds if included_feeds else ()),
+                *(included_tags if included_tags else ()),
+            )
             with self.__get_connection(use_transaction=False) as conn:
                 return conn.execute(
-                    f"SELECT COUNT(*) FROM entries {where_clause};",
-                    (
-                        *(included_feeds if included_feeds else ()),
-                        *(included_tags if included_tags else ()),
-                    ),
+                    f"SELECT (SELECT COUNT(*) FROM entries {where_clause}) + \
+                        (SELECT COUNT(*) FROM entries_archive {where_clause});",
+                    (*params, *params),
                 ).fetchone()[0]
 
+    def archive_entries(self, *, downloaded_before: Epoch, batch_size: int) -> int:
+        # Entries are moved oldest ID first, stopping at the first one that is too
+        # new, so every archived ID stays below every ID in the entries table.
+        # Each batch is its own transaction so other users of the connection can
+        # get in between batches.
+        columns = "id, feed_id, title, link, epoch_published, epoch_updated, \
+            epoch_downloaded"
+        moved = 0
+        while True:
+            with self.__get_connection() as conn:
+                last_id: typing.Optional[int] = None
+                for entry_id, epoch_downloaded in conn.execute(
+                    "SELECT id, epoch_downloaded FROM entries ORDER BY id ASC LIMIT ?;",
+                    (batch_size,),
+                ):
+                    if (
+                        epoch_downloaded is None
+                        or epoch_downloaded >= downloaded_before
+                    ):
+                        break
+                    last_id = entry_id
+                    moved += 1
+                if last_id is None:
+                    return moved
+                conn.execute(
+                    f"INSERT INTO entries_archive({columns}) SELECT {columns} FROM \
+                        entries WHERE id <= ?;",
+                    (last_id,),
+                )
+                conn.execute("DELETE FROM entries WHERE id <= ?;", (last_id,))
+
+    def get_feed_content_hash(self, feed_id: FeedId) -> typing.Optional[bytes]:
+        with self.__get_connection(use_transaction=False) as conn:
+            row = conn.execute(
+                "SELECT hash FROM feed_content_hashes WHERE feed_id = ?;", (feed_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_feed_content_hash(self, feed_id: FeedId, content_hash: bytes) -> None:
+        with self.__get_connection() as conn:
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO feed_content_hashes(feed_id, hash) "
+                    "VALUES(?, ?);",
+                    (feed_id, content_hash),
+                )
+            except sqlite3.IntegrityError as e:
+                raise StorageConstraintViolationError(e)
+
+    def store_websub_subscription(
+        self, *, feed_id: FeedId, hub: str, topic: str, secret: str
+    ) -> None:
+        with self.__get_connection() as conn:
+            try:
+                conn.execute(
+                    "DELETE FROM websub_pending_subscriptions WHERE feed_id = ?;",
+                    (feed_id,),
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO websub_subscriptions(feed_id, hub, topic, "
+                    "secret, epoch_expires) VALUES(?, ?, ?, ?, NULL);",
+                    (feed_id, hub, topic, secret),
+                )
+            except sqlite3.IntegrityError as e:
+                raise StorageConstraintViolationError(e)
+
+    def get_websub_subscription(
+        self, feed_id: FeedId
+    ) -> typing.Optional[WebSubSubscription]:
+        with self.__get_connection(use_transaction=False) as conn:
+            row = conn.execute(
+                "SELECT hub, topic, secret, epoch_expires, epoch_pending_until FROM "
+                "websub_subscriptions LEFT JOIN websub_pending_subscriptions "
+                "USING (feed_id) WHERE feed_id = ?;",
+                (feed_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return WebSubSubscription(
+            feed_id=feed_id,
+            hub=row[0],
+            topic=row[1],
+            secret=row[2],
+            epoch_expires=row[3],
+            epoch_pending_until=row[4],
+        )
+
+    def get_websub_subscriptions_expiring_before(
+        self, epoch: Epoch
+    ) -> list[WebSubSubscription]:
+        with self.__get_connection(use_transaction=False) as conn:
+            resp = conn.execute(
+                "SELECT feed_id, hub, topic, secret, epoch_expires, epoch_pending_until "
+                "FROM websub_subscriptions LEFT JOIN websub_pending_subscriptions "
+                "USING (feed_id) WHERE epoch_expires IS NULL OR epoch_expires < ?;",
+                (epoch,),
+            ).fetchall()
+        return [
+            WebSubSubscription(
+                feed_id=row[0],
+                hub=row[1],
+                topic=row[2],
+                secret=row[3],
+                epoch_expires=row[4],
+                epoch_pending_until=row[5],
+            )
+            for row in resp
+        ]
+
+    def get_websub_subscribed_feed_ids(self, *, active_at: Epoch) -> set[FeedId]:
+        with self.__get_connection(use_transaction=False) as conn:
+            return {
+                row[0]
+                for row in conn.execute(
+                    "SELECT feed_id FROM websub_subscriptions WHERE epoch_expires > ?;",
+                    (active_at,),
+                )
+            }
+
+    def set_websub_subscription_expiry(
+        self, feed_id: FeedId, epoch_expires: Epoch
+    ) -> None:
+        with self.__get_connection() as conn:
+            conn.execute(
+                "UPDATE websub_subscriptions SET epoch_expires = ? WHERE feed_id = ?;",
+                (epoch_expires, feed_id),
+            )
+
+    def set_websub_subscription_pending(
+        self, feed_id: FeedId, epoch_pending_until: typing.Optional[Epoch]
+    ) -> None:
+        with self.__get_connection() as conn:
+            if epoch_pending_until is None:
+                conn.execute(
+                    "DELETE FROM websub_pending_subscriptions WHERE feed_id = ?;",
+                    (feed_id,),
+                )
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO websub_pending_subscriptions(feed_id, "
+                    "epoch_pending_until) SELECT feed_id, ? FROM websub_subscriptions "
+                    "WHERE feed_id = ?;",
+                    (epoch_pending_until, feed_id),
+                )
+
+    def delete_websub_subscription(self, feed_id: FeedId) -> None:
+        with self.__get_connection() as conn:
+            conn.execute(
+                "DELETE FROM websub_subscriptions WHERE feed_id = ?;", (feed_id,)
+            )
+
+    def backup(
+        self,
+        target_path: str | pathlib.Path,
+        *,
+        pages_per_step: int,
+        pause_seconds: float,
+    ) -> float:
+        # Uses the online backup API. Returns the number of seconds other users of
+        # the storage were blocked.
+        seconds_blocking = 0.0
+        target = sqlite3.connect(target_path)
+        try:
+            if self.__wal:
+                # With WAL, a read transaction doesn't block writers, so the whole
+                # database is copied in one step from a separate connection. That
+                # step reads a single snapshot, so unlike a copy made in several
+                # steps, it never starts over because another connection (or
+                # process) wrote in between.
+                source = sqlite3.connect(self.__storage_path)
+                try:
+                    source.backup(target)
+                finally:
+                    source.close()
+                return seconds_blocking
+            # Otherwise pages_per_step pages are copied at a time with the lock held,
+            # releasing it in between. Since the copy is made through our own
+            # connection, writes made between steps are picked up by the backup
+            # instead of making it start over.
+            self.__lock.acquire()
+            step_start = time.perf_counter()
+
+            def progress(_status: int, _remaining: int, _total: int) -> None:
+                nonlocal seconds_blocking, step_start
+                seconds_blocking += time.perf_counter() - step_start
+                self.__lock.release()
+                time.sleep(pause_seconds)
+                self.__lock.acquire()
+                step_start = time.perf_counter()
+
+            try:
+                self.__raw_connection.backup(
+                    target, pages=pages_per_step, progress=progress
+                )
+            finally:
+                seconds_blocking += time.perf_counter() - step_start
+                self.__lock.release()
+        finally:
+            target.close()
+        return seconds_blocking
+
     def close(self):
         with self.__get_connection(use_transaction=False) as conn:
             conn.close()
 
 
+# Stands in for NULL in the integer columns of MemoryStorageProvider.
+_NULL_EPOCH = -(2**63)
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
+class _FeedEntryColumns:
+    # Entries are appended in ascending ID order, so ids is always sorted.
+    ids: array.array = dataclasses.field(default_factory=lambda: array.array("q"))
+    titles: list[typing.Optional[str]] = dataclasses.field(default_factory=list)
+    links: list[typing.Optional[str]] = dataclasses.field(default_factory=list)
+    epochs_published: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+    epochs_updated: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+    epochs_downloaded: array.array = dataclasses.field(
+        default_factory=lambda: array.array("q")
+    )
+    keys: set[EntryKey] = dataclasses.field(default_factory=set)
+
+    def get_entry(self, feed_id: FeedId, i: int) -> Entry:
+        epoch_published = self.epochs_published[i]
+        epoch_updated = self.epochs_updated[i]
+        return Entry(
+            id=self.ids[i],
+            feed_id=feed_id,
+            title=self.titles[i],  # type: ignore
+            link=self.links[i],  # type: ignore
+            epoch_published=None if epoch_published == _NULL_EPOCH else epoch_published,  # type: ignore
+            epoch_updated=None if epoch_updated == _NULL_EPOCH else epoch_updated,  # type: ignore
+        )
+
+
+class MemoryStorageProvider(StorageProvider):
+    # Keeps everything in memory, with each feed's entries in array-backed
+    # columns. Meant for tests and benchmarks; nothing is persisted.
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__feeds: dict[FeedId, Feed] = {}
+        self.__feed_ids_by_source: dict[str, FeedId] = {}
+        self.__feed_ids_by_title: dict[str, FeedId] = {}
+        self.__entries: dict[FeedId, _FeedEntryColumns] = {}
+        self.__entry_count = 0
+        self.__last_feed_id: FeedId = 0
+        self.__last_entry_id = 0
+        self.__feeds_version = 0
+        self.__content_hashes: dict[FeedId, bytes] = {}
+        self.__websub_subscriptions: dict[FeedId, WebSubSubscription] = {}
+
+    def __filter_feed_ids(
+        self,
+        included_feeds: typing.Optional[typing.Collection[int]],
+        included_tags: typing.Optional[typing.Collection[str]],
+    ) -> list[FeedId]:
+        # Must be called with the lock held.
+        return [
+            feed.id
+            for feed in self.__feeds.values()
+            if not (included_feeds and feed.id not in included_feeds)
+            and not (
+                included_tags
+                and not all(tag in feed.tags for tag in included_tags)  # type: ignore
+            )
+        ]
+
+    def store_feed(self, *, source: str, title: str, tags: list[str]) -> FeedId:
+        with self.__lock:
+            if source in self.__feed_ids_by_source:
+                raise FeedSourceAlreadyExistsError
+            if title in self.__feed_ids_by_title:
+                raise FeedTitleAlreadyInUseError(title)
+            self.__last_feed_id += 1
+            feed_id = self.__last_feed_id
+            self.__feeds[feed_id] = Feed(
+                id=feed_id, source=source, title=title, tags=list(tags)
+            )
+            self.__feed_ids_by_source[source] = feed_id
+            self.__feed_ids_by_title[title] = feed_id
+            self.__entries[feed_id] = _FeedEntryColumns()
+            self.__feeds_version += 1
+        return feed_id
+
+    def get_feeds(
+        self,
+        *,
+        limit: int,
+        offset: int = 0,
+        included_feeds: typing.Optional[list[FeedId]] = None,
+        included_tags: typing.Optional[list[str]] = None,
+        get_tags: bool = False,
+    ) -> list[Feed]:
+        with self.__lock:
+            feed_ids = self.__filter_feed_ids(included_feeds, included_tags)
+            return [
+                Feed(
+                    id=feed.id,
+                    source=feed.source,
+                    title=feed.title,
+                    tags=list(feed.tags) if get_tags else None,  # type: ignore
+                )
+                for feed in (
+                    self.__feeds[feed_id]
+                    for feed_id in _paginate(feed_ids, limit=limit, offset=offset)
+                )
+            ]
+
+    def get_feed_count(
+        self,
+        *,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+    ) -> int:
+        with self.__lock:
+            return len(self.__filter_feed_ids(included_feeds, included_tags))
+
+    def __get_feed(self, feed_id: FeedId) -> Feed:
+        try:
+            return self.__feeds[feed_id]
+        except KeyError:
+            raise FeedDoesNotExistError
+
+    def get_feed_source(self, feed_id: FeedId) -> str:
+        with self.__lock:
+            return self.__get_feed(feed_id).source
+
+    def get_feed_title(self, feed_id: FeedId) -> str:
+        with self.__lock:
+            return self.__get_feed(feed_id).title
+
+    def get_feed_tags(self, feed_id: FeedId) -> list[str]:
+        with self.__lock:
+            feed = self.__feeds.get(feed_id)
+            return list(feed.tags) if feed else []  # type: ignore
+
+    def set_feed_source(self, feed_id: FeedId, feed_source: str) -> None:
+        with self.__lock:
+            feed = self.__feeds.get(feed_id)
+            if feed is None or feed.source == feed_source:
+                return
+            if feed_source in self.__feed_ids_by_source:
+                raise FeedSourceAlreadyExistsError
+            del self.__feed_ids_by_source[feed.source]
+            self.__feed_ids_by_source[feed_source] = feed_id
+            feed.source = feed_source
+            self.__feeds_version += 1
+
+    def set_feed_title(self, feed_id: FeedId, feed_title: str) -> None:
+        with self.__lock:
+            feed = self.__feeds.get(feed_id)
+            if feed is None or feed.title == feed_title:
+                return
+            if feed_title in self.__feed_ids_by_title:
+                raise FeedTitleAlreadyInUseError
+            del self.__feed_ids_by_title[feed.title]
+            self.__feed_ids_by_title[feed_title] = feed_id
+            feed.title = feed_title
+            self.__feeds_version += 1
+
+    def set_feed_tags(self, feed_id: FeedId, feed_tags: list[str]) -> None:
+        with self.__lock:
+            feed = self.__feeds.get(feed_id)
+            if feed is not None:
+                feed.tags = list(feed_tags)
+                self.__feeds_version += 1
+            elif feed_tags:
+                raise StorageConstraintViolationError(f"No feed has ID {feed_id}.")
+
+    def delete_feed(self, feed_id: FeedId) -> None:
+        with self.__lock:
+            feed = self.__feeds.pop(feed_id, None)
+            if feed is None:
+                return
+            del self.__feed_ids_by_source[feed.source]
+            del self.__feed_ids_by_title[feed.title]
+            self.__entry_count -= len(self.__entries.pop(feed_id).ids)
+            self.__content_hashes.pop(feed_id, None)
+            self.__websub_subscriptions.pop(feed_id, None)
+            self.__feeds_version += 1
+
+    def get_feeds_version(self) -> int:
+        with self.__lock:
+            return self.__feeds_version
+
+    def store_entries(
+        self,
+        *,
+        parsed: ParsedFeed,
+        feed_id: FeedId,
+        epoch_downloaded: Epoch,
+    ) -> None:
+        if not parsed.entries:
+            return
+        with self.__lock:
+            try:
+                columns = self.__entries[feed_id]
+            except KeyError:
+                raise StorageConstraintViolationError(f"No feed has ID {feed_id}.")
+            for entry in reversed(parsed.entries):
+                key = _get_entry_key(entry)
+                if key in columns.keys:
+                    continue
+                title, link, epoch_published, epoch_updated = key
+                self.__last_entry_id += 1
+                columns.ids.append(self.__last_entry_id)
+                columns.titles.append(title)
+                columns.links.append(link)
+                columns.epochs_published.append(
+                    _NULL_EPOCH if epoch_published is None else epoch_published
+                )
+                columns.epochs_updated.append(
+                    _NULL_EPOCH if epoch_updated is None else epoch_updated
+                )
+                columns.epochs_downloaded.append(epoch_downloaded)
+                columns.keys.add(key)
+                self.__entry_count += 1
+
+    def get_entries(
+        self,
+        *,
+        limit: int,
+        offset: int = 0,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+        before_id: typing.Optional[int] = None,
+        after_id: typing.Optional[int] = None,
+    ) -> list[Entry]:
+        ascending = after_id is not None
+
+        def iter_feed(feed_id: FeedId, columns: _FeedEntryColumns):
+            start = (
+                0 if after_id is None else bisect.bisect_right(columns.ids, after_id)
+            )
+            if before_id is None:
+                end = len(columns.ids)
+            else:
+                end = bisect.bisect_left(columns.ids, before_id)
+            indices = range(start, end) if ascending else range(end - 1, start - 1, -1)
+            for i in indices:
+                yield (columns.ids[i], feed_id, i)
+
+        with self.__lock:
+            merged = heapq.merge(
+                *(
+                    iter_feed(feed_id, self.__entries[feed_id])
+                    for feed_id in self.__filter_feed_ids(included_feeds, included_tags)
+                ),
+                reverse=not ascending,
+            )
+            return [
+                self.__entries[feed_id].get_entry(feed_id, i)
+                for _, feed_id, i in _paginate(merged, limit=limit, offset=offset)
+            ]
+
+    def get_entry_count(
+        self,
+        *,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+    ) -> int:
+        with self.__lock:
+            if not (included_feeds or included_tags):
+                return self.__entry_count
+            return sum(
+                len(self.__entries[feed_id].ids)
+                for feed_id in self.__filter_feed_ids(included_feeds, included_tags)
+            )
+
+    def archive_entries(self, *, downloaded_before: Epoch, batch_size: int) -> int:
+        # There is only one tier.
+        return 0
+
+    def get_feed_content_hash(self, feed_id: FeedId) -> typing.Optional[bytes]:
+        with self.__lock:
+            return self.__content_hashes.get(feed_id)
+
+    def set_feed_content_hash(self, feed_id: FeedId, content_hash: bytes) -> None:
+        with self.__lock:
+            if feed_id not in self.__feeds:
+                raise StorageConstraintViolationError(f"No feed has ID {feed_id}.")
+            self.__content_hashes[feed_id] = content_hash
+
+    def store_websub_subscription(
+        self, *, feed_id: FeedId, hub: str, topic: str, secret: str
+    ) -> None:
+        with self.__lock:
+            if feed_id not in self.__feeds:
+                raise StorageConstraintViolationError(f"No feed has ID {feed_id}.")
+            self.__websub_subscriptions[feed_id] = WebSubSubscription(
+                feed_id=feed_id, hub=hub, topic=topic, secret=secret
+            )
+
+    def get_websub_subscription(
+        self, feed_id: FeedId
+    ) -> typing.Optional[WebSubSubscription]:
+        with self.__lock:
+            subscription = self.__websub_subscriptions.get(feed_id)
+            return dataclasses.replace(subscription) if subscription else None
+
+    def get_websub_subscriptions_expiring_before(
+        self, epoch: Epoch
+    ) -> list[WebSubSubscription]:
+        with self.__lock:
+            return [
+                dataclasses.replace(subscription)
+                for subscription in self.__websub_subscriptions.values()
+                if subscription.epoch_expires is None
+                or subscription.epoch_expires < epoch
+            ]
+
+    def get_websub_subscribed_feed_ids(self, *, active_at: Epoch) -> set[FeedId]:
+        with self.__lock:
+            return {
+                subscription.feed_id
+                for subscription in self.__websub_subscriptions.values()
+                if subscription.epoch_expires is not None
+                and subscription.epoch_expires > active_at
+            }
+
+    def set_websub_subscription_expiry(
+        self, feed_id: FeedId, epoch_expires: Epoch
+    ) -> None:
+        with self.__lock:
+            subscription = self.__websub_subscriptions.get(feed_id)
+            if subscription is not None:
+                subscription.epoch_expires = epoch_expires
+
+    def set_websub_subscription_pending(
+        self, feed_id: FeedId, epoch_pending_until: typing.Optional[Epoch]
+    ) -> None:
+        with self.__lock:
+            subscription = self.__websub_subscriptions.get(feed_id)
+            if subscription is not None:
+                subscription.epoch_pending_until = epoch_pending_until
+
+    def delete_websub_subscription(self, feed_id: FeedId) -> None:
+        with self.__lock:
+            self.__websub_subscriptions.pop(feed_id, None)
+
+    def close(self) -> None:
+        pass
+
+
 class TagRss:
-    def __init__(self, *, storage_path: str | pathlib.Path):
-        self.__storage = SqliteStorageProvider(storage_path)
+    def __init__(
+        self,
+        *,
+        storage_path: typing.Optional[str | pathlib.Path] = None,
+        storage_provider: typing.Optional[StorageProvider] = None,
+        websub_callback_base: typing.Optional[str] = None,
+        websub_lease_seconds: int = 10 * 24 * 60 * 60,
+        feed_cache_seconds: typing.Optional[float] = None,
+    ):
+        if storage_provider is not None:
+            self.__storage = storage_provider
+        elif storage_path is not None:
+            self.__storage = SqliteStorageProvider(storage_path)
+        else:
+            raise ValueError("Either storage_path or storage_provider must be given.")
+        # Feed metadata rarely changes but is needed on almost every request, so
+        # all of it is kept in memory. Writers replace the whole dict (under the
+        # lock) rather than modifying it, so readers can use it without locking.
+        # Feeds are kept in ascending ID order, as new feeds always get higher
+        # IDs than existing ones. If other processes may change the feeds too,
+        # feed_cache_seconds sets how often to check whether the cache is stale.
+        self.__feeds_lock = threading.Lock()
+        self.__feed_cache_seconds = feed_cache_seconds
+        self.__load_feeds()
+        # Keys of the entries seen in the last fetch of each feed.
+        self.__last_entry_keys: dict[FeedId, frozenset[EntryKey]] = {}
+        # WebSub is only used if we know a URL at which hubs can reach us.
+        self.__websub_callback_base = websub_callback_base
+        self.__websub_lease_seconds = websub_lease_seconds
 
-    def __fetch_and_parse_feed(self, source) -> tuple[ParsedFeed, Epoch]:
+    def __fetch_feed(self, source) -> tuple[requests.Response, Epoch]:
         try:
             response = requests.get(source)
         except requests.ConnectionError as e:
@@ -427,13 +1444,30 @@ class TagRss:
             raise FeedFetchError(
                 feed_source=source, bad_source=True, status_code=response.status_code
             )
+        return (response, epoch_downloaded)
+
+    def __parse_response(self, response: requests.Response, source) -> ParsedFeed:
         try:
             base: str = response.headers["Content-Location"]
         except KeyError:
             base: str = source
+        return self.__parse_feed(
+            bytes(response.text, encoding="utf-8"), source=source, base=base
+        )
+
+    def __parse_feed(
+        self,
+        content: bytes,
+        *,
+        source: str,
+        base: str,
+        content_type: typing.Optional[str] = None,
+    ) -> ParsedFeed:
+        response_headers = {"Content-Location": base}
+        if content_type:
+            response_headers["Content-Type"] = content_type
         parsed: ParsedFeed = feedparser.parse(
-            io.BytesIO(bytes(response.text, encoding="utf-8")),
-            response_headers={"Content-Location": base},
+            io.BytesIO(content), response_headers=response_headers
         )
         if not (
             getattr(parsed.feed, "title", None)
@@ -441,45 +1475,196 @@ class TagRss:
             or getattr(parsed.feed, "id", None)
         ):
             raise NotAFeedError(source)
-        return (parsed, epoch_downloaded)
+        return parsed
+
+    def __websub_callback(self, feed_id: FeedId) -> str:
+        assert self.__websub_callback_base is not None
+        return f"{self.__websub_callback_base.rstrip('/')}/websub/{feed_id}"
+
+    def __request_websub_subscription(
+        self, subscription: WebSubSubscription, *, mode: str = "subscribe"
+    ) -> bool:
+        data = {
+            "hub.mode": mode,
+            "hub.topic": subscription.topic,
+            "hub.callback": self.__websub_callback(subscription.feed_id),
+        }
+        if mode == "subscribe":
+            data["hub.secret"] = subscription.secret
+            data["hub.lease_seconds"] = str(self.__websub_lease_seconds)
+            # Marked first, as hubs may verify straight away.
+            self.__storage.set_websub_subscription_pending(
+                subscription.feed_id,
+                int(time.time()) + WEBSUB_VERIFICATION_WINDOW_SECONDS,
+            )
+        try:
+            response = requests.post(subscription.hub, data=data, timeout=30)
+        except requests.RequestException:
+            return False
+        return response.status_code in (202, 204)
+
+    def __maybe_subscribe_websub(self, feed_id: FeedId, parsed: ParsedFeed) -> None:
+        if self.__websub_callback_base is None:
+            return
+        if self.__storage.get_websub_subscription(feed_id) is not None:
+            return
+        links: list[dict] = parsed.feed.get("links", [])  # type: ignore
+        hubs = [link["href"] for link in links if link.get("rel") == "hub"]
+        if not hubs:
+            return
+        topic: typing.Optional[str] = next(
+            (link["href"] for link in links if link.get("rel") == "self"), None
+        )
+        if topic is None:
+            topic = self.get_feed_source(feed_id)
+        for hub in hubs:
+            subscription = WebSubSubscription(
+                feed_id=feed_id, hub=hub, topic=topic, secret=secrets.token_hex(32)
+            )
+            # Stored before asking the hub, since it may verify our intent before
+            # it even responds to the request.
+            try:
+                self.__storage.store_websub_subscription(
+                    feed_id=feed_id, hub=hub, topic=topic, secret=subscription.secret
+                )
+            except StorageConstraintViolationError:
+                return
+            if self.__request_websub_subscription(subscription):
+                return
+            self.__storage.delete_websub_subscription(feed_id)
 
     def add_feed(
         self, source: str, tags: list[str], custom_title: typing.Optional[str] = None
     ) -> int:
-        parsed, epoch_downloaded = self.__fetch_and_parse_feed(source)
+        response, epoch_downloaded = self.__fetch_feed(source)
+        parsed = self.__parse_response(response, source)
         title: str = parsed.feed.get("title", "")  # type: ignore
-        feed_id = self.__storage.store_feed(
+        feed = Feed(
+            id=0,
             source=source,
             title=custom_title if custom_title else title,
-            tags=tags,
+            tags=list(tags),
         )
+        with self.__feeds_lock:
+            feed.id = self.__storage.store_feed(
+                source=feed.source, title=feed.title, tags=tags
+            )
+            self.__feeds = {**self.__feeds, feed.id: feed}
         self.__storage.store_entries(
             parsed=parsed,
-            feed_id=feed_id,
+            feed_id=feed.id,
             epoch_downloaded=epoch_downloaded,
         )
-        return feed_id
+        self.__remember_content(feed.id, response, parsed)
+        self.__maybe_subscribe_websub(feed.id, parsed)
+        return feed.id
+
+    def __load_feeds(self) -> None:
+        # Must be called with __feeds_lock held (or from __init__). The version is
+        # read first so that changes made while loading are noticed next time.
+        self.__feeds_version = self.__storage.get_feeds_version()
+        self.__feeds: dict[FeedId, Feed] = {
+            feed.id: feed
+            for feed in self.__storage.get_feeds(
+                limit=self.__storage.get_feed_count(), get_tags=True
+            )
+        }
+        self.__feeds_checked = time.monotonic()
+
+    def __get_feeds(self, *, force_check: bool = False) -> dict[FeedId, Feed]:
+        if self.__feed_cache_seconds is None:
+            return self.__feeds
+        if (
+            force_check
+            or time.monotonic() - self.__feeds_checked >= self.__feed_cache_seconds
+        ):
+            with self.__feeds_lock:
+                if (
+                    force_check
+                    or time.monotonic() - self.__feeds_checked
+                    >= self.__feed_cache_seconds
+                ):
+                    if self.__storage.get_feeds_version() != self.__feeds_version:
+                        self.__load_feeds()
+                    else:
+                        self.__feeds_checked = time.monotonic()
+        return self.__feeds
+
+    def get_feed(self, feed_id: FeedId) -> Feed:
+        try:
+            return self.__get_feeds()[feed_id]
+        except KeyError:
+            pass
+        # It may have just been added by another process.
+        try:
+            return self.__get_feeds(force_check=True)[feed_id]
+        except KeyError:
+            raise FeedDoesNotExistError
 
     def get_feed_source(self, feed_id: FeedId) -> str:
-        return self.__storage.get_feed_source(feed_id)
+        return self.get_feed(feed_id).source
 
     def get_feed_title(self, feed_id: FeedId) -> str:
-        return self.__storage.get_feed_title(feed_id)
+        return self.get_feed(feed_id).title
 
     def get_feed_tags(self, feed_id: FeedId) -> list[str]:
-        return self.__storage.get_feed_tags(feed_id)
+        return self.get_feed(feed_id).tags  # type: ignore
+
+    def __replace_cached_feed(self, feed_id: FeedId, **changes) -> None:
+        # Must be called with __feeds_lock held.
+        try:
+            feed = dataclasses.replace(self.__feeds[feed_id], **changes)
+        except KeyError:
+            return
+        self.__feeds = {**self.__feeds, feed_id: feed}
 
     def set_feed_source(self, feed_id: FeedId, feed_source: str):
-        self.__storage.set_feed_source(feed_id, feed_source)
+        with self.__feeds_lock:
+            feed = self.__feeds.get(feed_id)
+            self.__storage.set_feed_source(feed_id, feed_source)
+            self.__replace_cached_feed(feed_id, source=feed_source)
+        if feed is not None and feed.source != feed_source:
+            # The hub and topic may no longer apply; the next update will look for
+            # them again.
+            self.__cancel_websub_subscription(feed_id)
 
     def set_feed_title(self, feed_id: FeedId, feed_title: str) -> None:
-        self.__storage.set_feed_title(feed_id, feed_title)
+        with self.__feeds_lock:
+            self.__storage.set_feed_title(feed_id, feed_title)
+            self.__replace_cached_feed(feed_id, title=feed_title)
 
     def set_feed_tags(self, feed_id: FeedId, feed_tags: list[str]):
-        self.__storage.set_feed_tags(feed_id, feed_tags)
+        with self.__feeds_lock:
+            self.__storage.set_feed_tags(feed_id, feed_tags)
+            self.__replace_cached_feed(feed_id, tags=list(feed_tags))
 
     def delete_feed(self, feed_id: int) -> None:
-        self.__storage.delete_feed(feed_id)
+        subscription = self.__storage.get_websub_subscription(feed_id)
+        with self.__feeds_lock:
+            self.__storage.delete_feed(feed_id)
+            self.__feeds = {
+                id: feed for id, feed in self.__feeds.items() if id != feed_id
+            }
+        self.__last_entry_keys.pop(feed_id, None)
+        if subscription is not None and self.__websub_callback_base is not None:
+            self.__request_websub_subscription(subscription, mode="unsubscribe")
+
+    def __filter_feeds(
+        self,
+        included_feeds: typing.Optional[typing.Collection[int]],
+        included_tags: typing.Optional[typing.Collection[str]],
+    ) -> typing.Iterable[Feed]:
+        feeds: typing.Iterable[Feed] = self.__get_feeds().values()
+        if included_feeds:
+            included_feed_set = set(included_feeds)
+            feeds = (feed for feed in feeds if feed.id in included_feed_set)
+        if included_tags:
+            feeds = (
+                feed
+                for feed in feeds
+                if all(tag in feed.tags for tag in included_tags)  # type: ignore
+            )
+        return feeds
 
     def get_feeds(
         self,
@@ -490,12 +1675,11 @@ class TagRss:
         included_tags: typing.Optional[list[str]] = None,
         get_tags: bool = False,
     ) -> list[Feed]:
-        return self.__storage.get_feeds(
+        # Tags are always filled in since they're cached anyway.
+        return _paginate(
+            self.__filter_feeds(included_feeds, included_tags),
             limit=limit,
             offset=offset,
-            included_feeds=included_feeds,
-            included_tags=included_tags,
-            get_tags=get_tags,
         )
 
     def get_feed_count(
@@ -504,9 +1688,9 @@ class TagRss:
         included_feeds: typing.Optional[typing.Collection[int]] = None,
         included_tags: typing.Optional[typing.Collection[str]] = None,
     ) -> int:
-        return self.__storage.get_feed_count(
-            included_feeds=included_feeds, included_tags=included_tags
-        )
+        if not (included_feeds or included_tags):
+            return len(self.__get_feeds())
+        return sum(1 for _ in self.__filter_feeds(included_feeds, included_tags))
 
     def get_entries(
         self,
@@ -523,6 +1707,30 @@ class TagRss:
             included_tags=included_tags,
         )
 
+    def iter_entries_since(
+        self,
+        *,
+        since_id: int = 0,
+        included_feeds: typing.Optional[typing.Collection[int]] = None,
+        included_tags: typing.Optional[typing.Collection[str]] = None,
+        batch_size: int = 500,
+    ) -> typing.Iterator[list[Entry]]:
+        # Yields every entry with an ID above since_id, oldest first, in batches.
+        # Each batch continues from the last ID seen rather than using an offset,
+        # so the cost of a batch doesn't grow with how far along the export is.
+        after_id = since_id
+        while True:
+            batch = self.__storage.get_entries(
+                limit=batch_size,
+                included_feeds=included_feeds,
+                included_tags=included_tags,
+                after_id=after_id,
+            )
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
     def get_entry_count(
         self,
         *,
@@ -533,10 +1741,50 @@ class TagRss:
             included_feeds=included_feeds, included_tags=included_tags
         )
 
+    def archive_entries(
+        self, *, older_than_seconds: int, batch_size: int = 1000
+    ) -> int:
+        return self.__storage.archive_entries(
+            downloaded_before=int(time.time()) - older_than_seconds,
+            batch_size=batch_size,
+        )
+
+    def __remember_content(
+        self, feed_id: FeedId, response: requests.Response, parsed: ParsedFeed
+    ) -> None:
+        self.__storage.set_feed_content_hash(
+            feed_id, hashlib.sha256(response.content).digest()
+        )
+        self.__last_entry_keys[feed_id] = frozenset(
+            _get_entry_key(entry) for entry in parsed.entries
+        )
+
     def update_feed(self, feed_id: FeedId) -> None:
         source = self.get_feed_source(feed_id)
-        parsed, epoch_downloaded = self.__fetch_and_parse_feed(source)
-        self.store_feed_entries(parsed, feed_id, epoch_downloaded)
+        response, epoch_downloaded = self.__fetch_feed(source)
+        # Many feeds are served without ETag or Last-Modified, so check ourselves
+        # whether anything changed before doing the work of parsing.
+        if hashlib.sha256(
+            response.content
+        ).digest() == self.__storage.get_feed_content_hash(feed_id):
+            return
+        parsed = self.__parse_response(response, source)
+        # Only entries that weren't in the last fetch can be new, so the rest
+        # needn't be offered to the storage only to be rejected as duplicates.
+        last_entry_keys = self.__last_entry_keys.get(feed_id)
+        if last_entry_keys is None:
+            new_parsed = parsed
+        else:
+            new_parsed = feedparser.FeedParserDict(parsed)
+            new_parsed["entries"] = [
+                entry
+                for entry in parsed.entries
+                if _get_entry_key(entry) not in last_entry_keys
+            ]
+        if new_parsed.entries:
+            self.store_feed_entries(new_parsed, feed_id, epoch_downloaded)
+        self.__remember_content(feed_id, response, parsed)
+        self.__maybe_subscribe_websub(feed_id, parsed)
 
     def store_feed_entries(
         self, parsed: ParsedFeed, feed_id: FeedId, epoch_downloaded: int
@@ -545,5 +1793,163 @@ class TagRss:
             parsed=parsed, feed_id=feed_id, epoch_downloaded=epoch_downloaded
         )
 
+    def __cancel_websub_subscription(self, feed_id: FeedId) -> None:
+        subscription = self.__storage.get_websub_subscription(feed_id)
+        if subscription is None:
+            return
+        self.__storage.delete_websub_subscription(feed_id)
+        if self.__websub_callback_base is not None:
+            self.__request_websub_subscription(subscription, mode="unsubscribe")
+
+    def get_websub_subscribed_feed_ids(self) -> set[FeedId]:
+        return self.__storage.get_websub_subscribed_feed_ids(active_at=int(time.time()))
+
+    def renew_websub_subscriptions(self, *, margin_seconds: int) -> None:
+        # Also retries subscriptions the hub never got around to verifying.
+        if self.__websub_callback_base is None:
+            return
+        for subscription in self.__storage.get_websub_subscriptions_expiring_before(
+            int(time.time()) + margin_seconds
+        ):
+            self.__request_websub_subscription(subscription)
+
+    def verify_websub_intent(
+        self,
+        feed_id: FeedId,
+        *,
+        mode: str,
+        topic: str,
+        lease_seconds: typing.Optional[int] = None,
+    ) -> bool:
+        subscription = self.__storage.get_websub_subscription(feed_id)
+        matches = subscription is not None and subscription.topic == topic
+        match mode:
+            case "subscribe":
+                # Only a (re)subscription we asked for can be verified, or anyone
+                # could set the lease.
+                now = int(time.time())
+                if (
+                    subscription is None
+                    or subscription.topic != topic
+                    or subscription.epoch_pending_until is None
+                    or now > subscription.epoch_pending_until
+                ):
+                    return False
+                if lease_seconds is None:
+                    lease_seconds = self.__websub_lease_seconds
+                # The hub may grant a shorter lease than we asked for, but anything
+                # outside that range is treated as the nearest end of it.
+                lease_seconds = max(1, min(lease_seconds, self.__websub_lease_seconds))
+                self.__storage.set_websub_subscription_expiry(
+                    feed_id, now + lease_seconds
+                )
+                self.__storage.set_websub_subscription_pending(feed_id, None)
+                return True
+            case "unsubscribe":
+                # We forget subscriptions before asking to end them.
+                return not matches
+            case "denied":
+                if matches:
+                    self.__storage.delete_websub_subscription(feed_id)
+                return True
+            case _:
+                return False
+
+    def store_websub_content(
+        self,
+        feed_id: FeedId,
+        content: bytes,
+        *,
+        signature: typing.Optional[str],
+        content_type: typing.Optional[str] = None,
+    ) -> bool:
+        # Returns whether the content was accepted. Content that is unsigned or has
+        # a bad signature must be ignored according to the WebSub spec.
+        subscription = self.__storage.get_websub_subscription(feed_id)
+        if subscription is None:
+            raise WebSubSubscriptionDoesNotExistError
+        if not signature:
+            return False
+        method, _, digest = signature.partition("=")
+        if method not in ("sha1", "sha256", "sha384", "sha512"):
+            return False
+        expected = hmac.new(
+            subscription.secret.encode("utf-8"), content, method
+        ).hexdigest()
+        if not hmac.compare_digest(expected, digest.lower()):
+            return False
+        epoch_downloaded = int(time.time())
+        parsed = self.__parse_feed(
+            content,
+            source=subscription.topic,
+            base=subscription.topic,
+            content_type=content_type,
+        )
+        self.store_feed_entries(parsed, feed_id, epoch_downloaded)
+        return True
+
+    def backup(
+        self,
+        directory: str | pathlib.Path,
+        *,
+        compress: bool = False,
+        keep: typing.Optional[int] = None,
+        pages_per_step: int = 256,
+        pause_seconds: float = 0.005,
+    ) -> BackupResult:
+        if keep is not None and keep < 1:
+            raise ValueError("keep must be at least 1.")
+        start = time.perf_counter()
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{BACKUP_PREFIX}{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}"
+        suffix = ".db.gz" if compress else ".db"
+        path = directory / f"{name}{suffix}"
+        i = 1
+        while path.exists():
+            path = directory / f"{name}-{i}{suffix}"
+            i += 1
+        # Written under a different name first so a partial backup is never
+        # mistaken for a complete one.
+        partial_path = path.with_name(path.name + ".partial")
+        compressed_partial_path = path.with_name(path.name + ".partial.gz")
+        try:
+            seconds_blocking = self.__storage.backup(
+                partial_path, pages_per_step=pages_per_step, pause_seconds=pause_seconds
+            )
+            if compress:
+                with (
+                    open(partial_path, "rb") as uncompressed,
+                    gzip.open(
+                        compressed_partial_path, "wb", compresslevel=6
+                    ) as compressed,
+                ):
+                    shutil.copyfileobj(uncompressed, compressed)
+                compressed_partial_path.rename(path)
+            else:
+                partial_path.rename(path)
+        finally:
+            partial_path.unlink(missing_ok=True)
+            compressed_partial_path.unlink(missing_ok=True)
+        if keep is not None:
+            backups = sorted(
+                (
+                    p
+                    for p in directory.iterdir()
+                    if p.name.startswith(BACKUP_PREFIX)
+                    and p.name.endswith((".db", ".db.gz"))
+                    and p != path
+                ),
+                key=lambda p: p.stat().st_mtime,
+            )
+            # The new backup is always kept, so it counts towards keep.
+            for old_backup in backups[: max(0, len(backups) - (keep - 1))]:
+                old_backup.unlink()
+        return BackupResult(
+            path=path,
+            seconds_total=time.perf_counter() - start,
+            seconds_blocking=seconds_blocking,
+        )
+
     def close(self) -> None:
         self.__storage.close()
@@ -0,0 +1,65 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import requests
+
+import contextlib
+import pathlib
+import signal
+import socket
+import subprocess
+import sys
+import time
+import typing
+
+REPO_PATH = pathlib.Path(__file__).parent.parent
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_serve(
+    *args: str, port: typing.Optional[int] = None
+) -> typing.Iterator[tuple[str, subprocess.Popen]]:
+    # Runs serve.py until it answers requests, yielding its base URL and process.
+    # It is interrupted (like Ctrl-C) afterwards unless it already exited.
+    if port is None:
+        port = find_free_port()
+    base = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            str(REPO_PATH / "serve.py"),
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            *args,
+        ],
+        cwd=REPO_PATH,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{base}/list_feeds", timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        else:
+            raise TimeoutError("serve.py did not start.")
+        yield base, process
+    finally:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
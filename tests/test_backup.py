@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import pytest
+
+import gzip
+import os
+import shutil
+import sqlite3
+
+import tagrss
+
+
+@pytest.fixture
+def core(tmp_path):
+    core = tagrss.TagRss(storage_path=tmp_path / "tagrss.db")
+    yield core
+    core.close()
+
+
+def count_feeds(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM feeds;").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_is_usable(core, tmp_path):
+    result = core.backup(tmp_path / "backups")
+    assert result.path.name.endswith(".db")
+    assert count_feeds(result.path) == 0
+    assert os.listdir(tmp_path / "backups") == [result.path.name]
+
+
+def test_compressed_backup(core, tmp_path):
+    result = core.backup(tmp_path / "backups", compress=True)
+    assert result.path.name.endswith(".db.gz")
+    assert os.listdir(tmp_path / "backups") == [result.path.name]
+    uncompressed = tmp_path / "uncompressed.db"
+    uncompressed.write_bytes(gzip.decompress(result.path.read_bytes()))
+    assert count_feeds(uncompressed) == 0
+
+
+def test_failed_compression_leaves_nothing(core, tmp_path, monkeypatch):
+    def fail(*_args, **_kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(shutil, "copyfileobj", fail)
+    with pytest.raises(OSError):
+        core.backup(tmp_path / "backups", compress=True)
+    assert os.listdir(tmp_path / "backups") == []
+
+
+def test_rotation_keeps_newest(core, tmp_path):
+    directory = tmp_path / "backups"
+    paths = []
+    for i in range(4):
+        paths.append(core.backup(directory, keep=2).path)
+        # Backups are ordered by modification time.
+        os.utime(paths[-1], (i, i))
+    assert sorted(os.listdir(directory)) == sorted(p.name for p in paths[-2:])
+
+    result = core.backup(directory, keep=1)
+    assert os.listdir(directory) == [result.path.name]
+
+
+def test_keep_must_be_positive(core, tmp_path):
+    with pytest.raises(ValueError):
+        core.backup(tmp_path / "backups", keep=0)
+    assert not (tmp_path / "backups").exists()
+
+
+def test_backup_reads_a_snapshot_without_blocking_writers(core, tmp_path):
+    # Another process in the middle of a write must neither hold up the backup nor
+    # have its uncommitted changes copied.
+    writer = sqlite3.connect(tmp_path / "tagrss.db", isolation_level=None)
+    try:
+        writer.execute("BEGIN IMMEDIATE;")
+        writer.execute("INSERT INTO feeds(source, title) VALUES('s', 't');")
+        result = core.backup(tmp_path / "backups")
+        writer.execute("COMMIT;")
+    finally:
+        writer.close()
+    assert result.seconds_blocking == 0
+    assert count_feeds(result.path) == 0
+    assert count_feeds(tmp_path / "tagrss.db") == 1
+
+
+def test_in_memory_backup(tmp_path):
+    # Without WAL, the copy is made a few pages at a time through the provider's
+    # own connection.
+    storage = tagrss.SqliteStorageProvider(":memory:")
+    storage.store_feed(source="https://example.com/feed", title="title", tags=[])
+    core = tagrss.TagRss(storage_provider=storage)
+    try:
+        result = core.backup(tmp_path / "backups", pages_per_step=1)
+    finally:
+        core.close()
+    assert count_feeds(result.path) == 1
@@ -0,0 +1,76 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import feedparser
+import pytest
+
+import sqlite3
+
+import tagrss
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = tagrss.SqliteStorageProvider(tmp_path / "tagrss.db")
+    storage.wait_for_migrations()
+    for i in range(4):
+        feed_id = storage.store_feed(
+            source=f"https://example.com/{i}", title=f"Feed {i}", tags=[f"t{i % 2}"]
+        )
+        storage.store_entries(
+            parsed=feedparser.FeedParserDict(
+                entries=[
+                    feedparser.FeedParserDict(title=f"{i}/{j}", link=f"{i}/{j}")
+                    for j in range(50)
+                ]
+            ),
+            feed_id=feed_id,
+            epoch_downloaded=i,
+        )
+    # The first two feeds' entries go to the archive.
+    storage.archive_entries(downloaded_before=2, batch_size=1000)
+    yield storage
+    storage.close()
+
+
+def run_traced(storage, tmp_path, **kwargs) -> tuple[list[str], list[str]]:
+    # Returns the statements get_entries() ran and SQLite's plans for them.
+    statements: list[str] = []
+    conn = storage._SqliteStorageProvider__raw_connection
+    conn.set_trace_callback(statements.append)
+    try:
+        storage.get_entries(**kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    statements = [s for s in statements if s.startswith("SELECT")]
+    other = sqlite3.connect(tmp_path / "tagrss.db")
+    try:
+        plans = [
+            row[3]
+            for statement in statements
+            for row in other.execute(f"EXPLAIN QUERY PLAN {statement}")
+        ]
+    finally:
+        other.close()
+    return statements, plans
+
+
+@pytest.mark.parametrize(
+    "filters", [dict(included_feeds=[1, 3]), dict(included_tags=["t1"])]
+)
+def test_filtered_export_is_read_in_id_order(storage, tmp_path, filters):
+    # Otherwise every batch would sort everything after it again.
+    _, plans = run_traced(storage, tmp_path, limit=10, after_id=20, **filters)
+    assert not any("TEMP B-TREE" in plan for plan in plans), plans
+
+
+def test_filtered_page_only_reads_archive_past_newest_entries(storage, tmp_path):
+    statements, _ = run_traced(storage, tmp_path, limit=10, included_tags=["t1"])
+    assert not any("entries_archive" in statement for statement in statements)
+
+    statements, _ = run_traced(
+        storage, tmp_path, limit=10, offset=45, included_tags=["t1"]
+    )
+    assert any("entries_archive" in statement for statement in statements)
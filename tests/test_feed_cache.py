@@ -0,0 +1,89 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import pytest
+
+import sqlite3
+
+import tagrss
+
+
+@pytest.fixture
+def core(tmp_path):
+    storage = tagrss.SqliteStorageProvider(tmp_path / "tagrss.db")
+    for i in range(3):
+        storage.store_feed(source=f"https://example.com/{i}", title=f"{i}", tags=[])
+    core = tagrss.TagRss(storage_provider=storage)
+    yield core
+    core.close()
+
+
+@pytest.mark.parametrize(
+    "limit,offset,expected_ids",
+    [
+        (2, 0, [1, 2]),
+        (2, 2, [3]),
+        (50, -50, [1, 2, 3]),
+        (2, -1, [1, 2]),
+        (-1, 0, [1, 2, 3]),
+        (-1, 1, [2, 3]),
+        (0, 0, []),
+    ],
+)
+def test_get_feeds_paging_matches_sqlite(core, limit, offset, expected_ids):
+    # Negative offsets and limits come straight from page_num and per_page.
+    feeds = core.get_feeds(limit=limit, offset=offset)
+    assert [feed.id for feed in feeds] == expected_ids
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "shared.db"
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.store_feed(source="https://example.com/a", title="a", tags=["x"])
+    storage.close()
+    return path
+
+
+def test_uses_wal(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+    finally:
+        conn.close()
+
+
+def test_notices_changes_from_other_processes(path):
+    # The second provider stands in for another process using the same file.
+    core = tagrss.TagRss(storage_path=path, feed_cache_seconds=0)
+    other = tagrss.SqliteStorageProvider(path)
+    try:
+        other.set_feed_title(1, "renamed")
+        other.set_feed_tags(1, ["y"])
+        assert core.get_feed(1).title == "renamed"
+        assert core.get_feeds(limit=10, included_tags=["y"])[0].id == 1
+        other.delete_feed(1)
+        assert core.get_feed_count() == 0
+    finally:
+        other.close()
+        core.close()
+
+
+def test_cache_is_only_checked_every_feed_cache_seconds(path):
+    core = tagrss.TagRss(storage_path=path, feed_cache_seconds=3600)
+    other = tagrss.SqliteStorageProvider(path)
+    try:
+        other.set_feed_title(1, "renamed")
+        assert core.get_feed(1).title == "a"
+        # A feed missing from the cache is always looked for, though.
+        feed_id = other.store_feed(source="https://example.com/b", title="b", tags=[])
+        assert core.get_feed(feed_id).title == "b"
+        assert core.get_feed(1).title == "renamed"
+        with pytest.raises(tagrss.FeedDoesNotExistError):
+            core.get_feed(feed_id + 1)
+    finally:
+        other.close()
+        core.close()
@@ -0,0 +1,129 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import shutil
+import sqlite3
+import threading
+import time
+
+import tagrss
+
+
+def get_schema(path) -> tuple[str, set[str]]:
+    conn = sqlite3.connect(path)
+    try:
+        version = conn.execute(
+            "SELECT value FROM tagrss_info WHERE info_key = 'version';"
+        ).fetchone()[0]
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master;")}
+        return version, names
+    finally:
+        conn.close()
+
+
+def test_versions_are_unique():
+    versions = [migration.version for migration in tagrss._get_migrations()]
+    assert len(versions) == len(set(versions))
+
+
+def test_fresh_database(tmp_path):
+    path = tmp_path / "tagrss.db"
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.close()
+    version, names = get_schema(path)
+    assert version == str(tagrss._get_migrations()[-1].version)
+    assert {"feeds", "entries", "entries_archive", "feeds_version"} <= names
+
+
+def test_background_migrations_run_after_foreground_ones(tmp_path):
+    path = tmp_path / "tagrss.db"
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.close()
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "DROP INDEX idx_entries_archive__feed_id__link;"
+        "UPDATE tagrss_info SET value = '5' WHERE info_key = 'version';"
+    )
+    conn.close()
+
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.store_feed(source="https://example.com", title="Example", tags=["a"])
+    assert storage.get_feeds_version() > 0
+    storage.close()
+    version, names = get_schema(path)
+    assert version == str(tagrss._get_migrations()[-1].version)
+    assert "idx_entries_archive__feed_id__link" in names
+
+
+def test_legacy_version_reapplies_everything(tmp_path):
+    # Versions from before migrations existed aren't numbers.
+    path = tmp_path / "tagrss.db"
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.store_feed(source="https://example.com", title="Example", tags=[])
+    storage.close()
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE tagrss_info SET value = '0.12.0' WHERE info_key = 'version';")
+    conn.commit()
+    conn.close()
+
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    assert storage.get_feed_count() == 1
+    storage.close()
+    assert get_schema(path)[0] == str(tagrss._get_migrations()[-1].version)
+
+
+def test_foreground_migrations_dont_wait_for_background_ones(tmp_path, monkeypatch):
+    migrations_path = tmp_path / "migrations"
+    shutil.copytree(tagrss.MIGRATIONS_PATH, migrations_path)
+    last = tagrss._get_migrations()[-1].version
+    (migrations_path / f"{last + 1:04}_late.sql").write_text(
+        "CREATE TABLE IF NOT EXISTS late(id INTEGER PRIMARY KEY) STRICT;"
+    )
+    (migrations_path / f"{last + 2:04}_late_index.background.sql").write_text(
+        "CREATE INDEX IF NOT EXISTS idx_late__id ON late(id);"
+    )
+    monkeypatch.setattr(tagrss, "MIGRATIONS_PATH", migrations_path)
+    path = tmp_path / "tagrss.db"
+    # Stop before the real background migration.
+    tagrss.SqliteStorageProvider(path, apply_background_migrations=False).close()
+    version, names = get_schema(path)
+    background_version = next(m for m in tagrss._get_migrations() if m.background)
+    assert version == str(background_version.version - 1)
+    assert "late" in names and "idx_late__id" not in names
+
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    storage.close()
+    version, names = get_schema(path)
+    assert version == str(last + 2)
+    assert "idx_late__id" in names
+
+
+def test_reads_carry_on_while_another_connection_writes(tmp_path):
+    # E.g. while a background migration builds an index.
+    path = tmp_path / "tagrss.db"
+    storage = tagrss.SqliteStorageProvider(path)
+    storage.wait_for_migrations()
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE;")
+    writer = threading.Thread(
+        target=storage.store_feed,
+        kwargs=dict(source="https://example.com", title="Example", tags=[]),
+    )
+    writer.start()
+    time.sleep(0.5)
+    start = time.monotonic()
+    assert storage.get_feed_count() == 0
+    assert time.monotonic() - start < 0.1
+    other.execute("COMMIT;")
+    other.close()
+    writer.join(10)
+    assert storage.get_feed_count() == 1
+    storage.close()
@@ -0,0 +1,556 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+# Every StorageProvider must behave the same; each test here runs against all of
+# them, and the last one also compares them against each other directly.
+import feedparser
+import pytest
+
+import random
+import time
+import typing
+
+import tagrss
+
+PROVIDER_NAMES = ["sqlite", "memory"]
+
+# feedparser falls back to published_parsed for a missing updated_parsed, with a
+# warning each time.
+pytestmark = pytest.mark.filterwarnings(
+    "ignore:To avoid breaking existing software:DeprecationWarning"
+)
+
+
+def open_provider(name: str, tmp_path) -> tagrss.StorageProvider:
+    if name == "sqlite":
+        storage = tagrss.SqliteStorageProvider(tmp_path / "tagrss.db")
+        storage.wait_for_migrations()
+        return storage
+    return tagrss.MemoryStorageProvider()
+
+
+@pytest.fixture(params=PROVIDER_NAMES)
+def storage(request, tmp_path):
+    storage = open_provider(request.param, tmp_path)
+    yield storage
+    storage.close()
+
+
+def make_parsed(*entries: dict) -> feedparser.FeedParserDict:
+    # Entries are given newest first, as in a feed.
+    return feedparser.FeedParserDict(
+        entries=[feedparser.FeedParserDict(entry) for entry in entries]
+    )
+
+
+def add_feed(
+    storage: tagrss.StorageProvider, name: str, tags: typing.Optional[list[str]] = None
+) -> int:
+    return storage.store_feed(
+        source=f"https://example.com/{name}", title=name, tags=tags or []
+    )
+
+
+def add_entries(storage: tagrss.StorageProvider, feed_id: int, *titles: str) -> None:
+    storage.store_entries(
+        parsed=make_parsed(
+            *(
+                {"title": title, "link": f"https://example.com/{title}"}
+                for title in titles
+            )
+        ),
+        feed_id=feed_id,
+        epoch_downloaded=0,
+    )
+
+
+def titles(entries: list[tagrss.Entry]) -> list[typing.Optional[str]]:
+    return [entry.title for entry in entries]
+
+
+def test_store_and_get_feed(storage):
+    feed_id = storage.store_feed(
+        source="https://example.com/a", title="A", tags=["x", "y z"]
+    )
+    assert storage.get_feed_source(feed_id) == "https://example.com/a"
+    assert storage.get_feed_title(feed_id) == "A"
+    assert sorted(storage.get_feed_tags(feed_id)) == ["x", "y z"]
+    (feed,) = storage.get_feeds(limit=10, get_tags=True)
+    assert (feed.id, feed.source, feed.title) == (feed_id, "https://example.com/a", "A")
+    assert sorted(feed.tags) == ["x", "y z"]
+
+
+def test_feed_ids_increase(storage):
+    ids = [add_feed(storage, name) for name in "abc"]
+    assert ids == sorted(ids)
+    storage.delete_feed(ids[-1])
+    assert add_feed(storage, "d") > ids[-1]
+
+
+def test_duplicate_source_and_title(storage):
+    feed_id = add_feed(storage, "a")
+    other_id = add_feed(storage, "b")
+    with pytest.raises(tagrss.FeedSourceAlreadyExistsError):
+        storage.store_feed(source="https://example.com/a", title="other", tags=[])
+    with pytest.raises(tagrss.FeedTitleAlreadyInUseError):
+        storage.store_feed(source="https://example.com/other", title="a", tags=[])
+    with pytest.raises(tagrss.FeedSourceAlreadyExistsError):
+        storage.set_feed_source(other_id, "https://example.com/a")
+    with pytest.raises(tagrss.FeedTitleAlreadyInUseError):
+        storage.set_feed_title(other_id, "a")
+    # Setting a feed's own values again is fine.
+    storage.set_feed_source(feed_id, "https://example.com/a")
+    storage.set_feed_title(feed_id, "a")
+    assert storage.get_feed_count() == 2
+
+
+def test_missing_feed(storage):
+    with pytest.raises(tagrss.FeedDoesNotExistError):
+        storage.get_feed_source(1)
+    with pytest.raises(tagrss.FeedDoesNotExistError):
+        storage.get_feed_title(1)
+    assert storage.get_feed_tags(1) == []
+
+
+def test_writes_to_missing_feed(storage):
+    with pytest.raises(tagrss.StorageConstraintViolationError):
+        add_entries(storage, 1, "a")
+    with pytest.raises(tagrss.StorageConstraintViolationError):
+        storage.set_feed_tags(1, ["x"])
+    with pytest.raises(tagrss.StorageConstraintViolationError):
+        storage.set_feed_content_hash(1, b"hash")
+    with pytest.raises(tagrss.StorageConstraintViolationError):
+        storage.store_websub_subscription(
+            feed_id=1, hub="https://hub.example.com", topic="t", secret="s"
+        )
+    # These have nothing to violate.
+    add_entries(storage, 1)
+    storage.set_feed_tags(1, [])
+    storage.set_feed_source(1, "https://example.com/a")
+    storage.set_feed_title(1, "a")
+    storage.delete_feed(1)
+    assert storage.get_feed_count() == 0
+    assert storage.get_entry_count() == 0
+
+
+def test_entry_dedupe(storage):
+    feed_id = add_feed(storage, "a")
+    other_id = add_feed(storage, "b")
+    published = time.gmtime(1000)
+    entries = [
+        {"title": "full", "link": "l", "published_parsed": published},
+        {"title": None, "link": None},
+        {"title": "no link"},
+        {"link": "no title", "updated_parsed": published},
+    ]
+    storage.store_entries(
+        parsed=make_parsed(*entries), feed_id=feed_id, epoch_downloaded=0
+    )
+    assert storage.get_entry_count() == 4
+    # NULL fields count as equal to each other, unlike in SQL comparisons.
+    storage.store_entries(
+        parsed=make_parsed(*entries), feed_id=feed_id, epoch_downloaded=1
+    )
+    assert storage.get_entry_count() == 4
+    # Any differing field makes a new entry, as does a different feed.
+    storage.store_entries(
+        parsed=make_parsed(
+            {"title": "full", "link": "l"},
+            {"title": "full", "link": "l", "updated_parsed": published},
+            {"title": None, "link": ""},
+        ),
+        feed_id=feed_id,
+        epoch_downloaded=2,
+    )
+    storage.store_entries(
+        parsed=make_parsed(*entries), feed_id=other_id, epoch_downloaded=2
+    )
+    assert storage.get_entry_count() == 11
+    assert storage.get_entry_count(included_feeds=[feed_id]) == 7
+
+
+def test_entries_stored_oldest_first(storage):
+    feed_id = add_feed(storage, "a")
+    storage.store_entries(
+        parsed=make_parsed(
+            {
+                "title": "new",
+                "link": "n",
+                "published_parsed": time.gmtime(1000),
+                "updated_parsed": time.gmtime(2000),
+            },
+            {"title": "old", "link": "o"},
+        ),
+        feed_id=feed_id,
+        epoch_downloaded=0,
+    )
+    new, old = storage.get_entries(limit=10)
+    assert (new.title, new.link, new.epoch_published, new.epoch_updated) == (
+        "new",
+        "n",
+        1000,
+        2000,
+    )
+    assert (old.title, old.link, old.epoch_published, old.epoch_updated) == (
+        "old",
+        "o",
+        None,
+        None,
+    )
+    assert new.feed_id == old.feed_id == feed_id
+    assert old.id < new.id
+
+
+@pytest.fixture
+def interleaved(storage):
+    # Entries 0-9 alternate between two feeds, stored oldest first.
+    a = add_feed(storage, "a", ["x"])
+    b = add_feed(storage, "b", ["x", "y"])
+    for i in range(10):
+        add_entries(storage, a if i % 2 == 0 else b, str(i))
+    return storage, a, b
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        ({"limit": 3}, "987"),
+        ({"limit": 3, "offset": 8}, "10"),
+        ({"limit": 3, "offset": 20}, ""),
+        ({"limit": 0}, ""),
+        # Like SQLite, a negative offset counts as 0 and a negative limit means no
+        # limit.
+        ({"limit": 2, "offset": -5}, "98"),
+        ({"limit": -1}, "9876543210"),
+        ({"limit": -1, "offset": 7}, "210"),
+    ],
+)
+def test_entry_pagination(interleaved, kwargs, expected):
+    storage, _, _ = interleaved
+    assert "".join(titles(storage.get_entries(**kwargs))) == expected  # type: ignore
+
+
+def test_keyset_pagination(interleaved):
+    storage, a, _ = interleaved
+    ids = [entry.id for entry in storage.get_entries(limit=-1)]
+    # before_id is exclusive and keeps newest-first order.
+    before = storage.get_entries(limit=3, before_id=ids[2])
+    assert [entry.id for entry in before] == ids[3:6]
+    assert titles(storage.get_entries(limit=2, offset=1, before_id=ids[2])) == [
+        "5",
+        "4",
+    ]
+    # after_id is exclusive and returns the oldest first.
+    after = storage.get_entries(limit=3, after_id=ids[-2])
+    assert titles(after) == ["2", "3", "4"]
+    assert titles(storage.get_entries(limit=3, after_id=0)) == ["0", "1", "2"]
+    assert titles(storage.get_entries(limit=-1, after_id=ids[1])) == ["9"]
+    assert titles(
+        storage.get_entries(limit=-1, after_id=ids[-1], before_id=ids[4])
+    ) == ["1", "2", "3", "4"]
+    assert titles(storage.get_entries(limit=2, after_id=0, included_feeds=[a])) == [
+        "0",
+        "2",
+    ]
+
+
+def test_tag_filters_require_every_tag(interleaved):
+    storage, a, b = interleaved
+    c = add_feed(storage, "c", ["y"])
+    add_entries(storage, c, "c0")
+
+    def feed_ids(**kwargs) -> list[int]:
+        return [feed.id for feed in storage.get_feeds(limit=10, **kwargs)]
+
+    assert feed_ids(included_tags=["x"]) == [a, b]
+    assert feed_ids(included_tags=["x", "y"]) == [b]
+    assert feed_ids(included_tags=["y"]) == [b, c]
+    assert feed_ids(included_tags=["x", "missing"]) == []
+    assert feed_ids(included_feeds=[a, c], included_tags=["y"]) == [c]
+    assert storage.get_feed_count(included_tags=["x", "y"]) == 1
+    assert storage.get_feed_count(included_feeds=[a, b], included_tags=["x"]) == 2
+
+    assert titles(storage.get_entries(limit=-1, included_tags=["x", "y"])) == list(
+        "97531"
+    )
+    assert storage.get_entry_count(included_tags=["x", "y"]) == 5
+    assert storage.get_entry_count(included_tags=["y"]) == 6
+    assert storage.get_entry_count(included_tags=["x"]) == 10
+    assert storage.get_entry_count(included_feeds=[a], included_tags=["y"]) == 0
+
+
+@pytest.mark.parametrize(
+    "kwargs,expected",
+    [
+        ({"limit": 2}, "ab"),
+        ({"limit": 2, "offset": 2}, "c"),
+        ({"limit": 2, "offset": -2}, "ab"),
+        ({"limit": -1}, "abc"),
+        ({"limit": -1, "offset": 1}, "bc"),
+        ({"limit": 0}, ""),
+    ],
+)
+def test_feed_pagination(storage, kwargs, expected):
+    for name in "abc":
+        add_feed(storage, name)
+    assert "".join(feed.title for feed in storage.get_feeds(**kwargs)) == expected
+
+
+def test_counts(interleaved):
+    storage, a, b = interleaved
+    assert storage.get_feed_count() == 2
+    assert storage.get_entry_count() == 10
+    assert storage.get_entry_count(included_feeds=[a]) == 5
+    storage.delete_feed(a)
+    assert storage.get_feed_count() == 1
+    assert storage.get_entry_count() == 5
+    assert storage.get_entry_count(included_feeds=[a]) == 0
+    assert titles(storage.get_entries(limit=-1)) == list("97531")
+    storage.delete_feed(b)
+    assert storage.get_entry_count() == 0
+
+
+def test_set_feed_tags(storage):
+    feed_id = add_feed(storage, "a", ["x"])
+    storage.set_feed_tags(feed_id, ["y", "z"])
+    assert sorted(storage.get_feed_tags(feed_id)) == ["y", "z"]
+    assert storage.get_feed_count(included_tags=["x"]) == 0
+    storage.set_feed_tags(feed_id, [])
+    assert storage.get_feed_tags(feed_id) == []
+
+
+def test_feeds_version_changes(storage):
+    versions = [storage.get_feeds_version()]
+
+    def changed() -> bool:
+        versions.append(storage.get_feeds_version())
+        return versions[-1] != versions[-2]
+
+    feed_id = add_feed(storage, "a")
+    assert changed()
+    storage.set_feed_source(feed_id, "https://example.com/b")
+    assert changed()
+    storage.set_feed_title(feed_id, "b")
+    assert changed()
+    storage.set_feed_tags(feed_id, ["x"])
+    assert changed()
+    add_entries(storage, feed_id, "entry")
+    storage.set_feed_content_hash(feed_id, b"hash")
+    assert not changed()
+    storage.delete_feed(feed_id)
+    assert changed()
+
+
+def test_content_hash(storage):
+    feed_id = add_feed(storage, "a")
+    assert storage.get_feed_content_hash(feed_id) is None
+    storage.set_feed_content_hash(feed_id, b"first")
+    storage.set_feed_content_hash(feed_id, b"second")
+    assert storage.get_feed_content_hash(feed_id) == b"second"
+    storage.delete_feed(feed_id)
+    assert storage.get_feed_content_hash(feed_id) is None
+
+
+def test_websub_subscriptions(storage):
+    a = add_feed(storage, "a")
+    b = add_feed(storage, "b")
+    assert storage.get_websub_subscription(a) is None
+    for feed_id in (a, b):
+        storage.store_websub_subscription(
+            feed_id=feed_id,
+            hub="https://hub.example.com",
+            topic=f"t{feed_id}",
+            secret="s",
+        )
+    subscription = storage.get_websub_subscription(a)
+    assert subscription == tagrss.WebSubSubscription(
+        feed_id=a, hub="https://hub.example.com", topic=f"t{a}", secret="s"
+    )
+    # Unverified subscriptions aren't active, but are due for renewal.
+    assert storage.get_websub_subscribed_feed_ids(active_at=0) == set()
+    assert {s.feed_id for s in storage.get_websub_subscriptions_expiring_before(0)} == {
+        a,
+        b,
+    }
+
+    storage.set_websub_subscription_expiry(a, 100)
+    storage.set_websub_subscription_expiry(b, 200)
+    assert storage.get_websub_subscription(a).epoch_expires == 100
+    assert storage.get_websub_subscribed_feed_ids(active_at=99) == {a, b}
+    assert storage.get_websub_subscribed_feed_ids(active_at=100) == {b}
+    assert storage.get_websub_subscribed_feed_ids(active_at=200) == set()
+    assert {
+        s.feed_id for s in storage.get_websub_subscriptions_expiring_before(150)
+    } == {a}
+
+    storage.set_websub_subscription_pending(a, 50)
+    assert storage.get_websub_subscription(a).epoch_pending_until == 50
+    assert storage.get_websub_subscription(b).epoch_pending_until is None
+    assert [
+        s.epoch_pending_until
+        for s in storage.get_websub_subscriptions_expiring_before(150)
+    ] == [50]
+    storage.set_websub_subscription_pending(a, None)
+    assert storage.get_websub_subscription(a).epoch_pending_until is None
+    storage.set_websub_subscription_pending(a, 60)
+
+    # Storing again replaces the subscription, including its expiry and whether
+    # it is pending.
+    storage.store_websub_subscription(
+        feed_id=a, hub="https://other.example.com", topic="t", secret="new"
+    )
+    subscription = storage.get_websub_subscription(a)
+    assert subscription is not None
+    assert (subscription.hub, subscription.secret) == (
+        "https://other.example.com",
+        "new",
+    )
+    assert subscription.epoch_expires is None
+    assert subscription.epoch_pending_until is None
+
+    storage.delete_websub_subscription(a)
+    assert storage.get_websub_subscription(a) is None
+    storage.delete_feed(b)
+    assert storage.get_websub_subscription(b) is None
+    # Nothing to update or delete any more.
+    storage.set_websub_subscription_expiry(a, 300)
+    storage.set_websub_subscription_pending(a, 300)
+    assert storage.get_websub_subscription(a) is None
+    storage.delete_websub_subscription(a)
+
+
+def normalise(name: str, result):
+    # Orders that the interface leaves unspecified.
+    match name:
+        case "get_feed_tags":
+            return sorted(result)
+        case "get_feeds":
+            return [
+                (
+                    f.id,
+                    f.source,
+                    f.title,
+                    sorted(f.tags) if f.tags is not None else None,
+                )
+                for f in result
+            ]
+        case "get_websub_subscriptions_expiring_before":
+            return sorted(result, key=lambda subscription: subscription.feed_id)
+    return result
+
+
+def test_random_operations_match(tmp_path):
+    # Applies the same random operations to every provider and checks that they
+    # all return (or raise) the same thing every time.
+    providers = [open_provider(name, tmp_path) for name in PROVIDER_NAMES]
+    rng = random.Random(1)
+    tags = ["a", "b", "c", "d e"]
+
+    def call(name: str, *args, **kwargs) -> None:
+        results = []
+        for provider in providers:
+            try:
+                result = (
+                    "ok",
+                    normalise(name, getattr(provider, name)(*args, **kwargs)),
+                )
+            except tagrss.StorageError as e:
+                result = ("error", type(e))
+            results.append(result)
+        assert all(result == results[0] for result in results), (name, args, kwargs)
+
+    def random_entry() -> dict:
+        entry: dict = {
+            "title": rng.choice([None, f"e{rng.randint(0, 40)}"]),
+            "link": f"l{rng.randint(0, 5)}",
+        }
+        if rng.random() < 0.5:
+            entry["published_parsed"] = time.gmtime(rng.randint(0, 3))
+        return entry
+
+    for step in range(3000):
+        op = rng.random()
+        feed_id = rng.randint(1, 25)
+        if op < 0.05:
+            call(
+                "store_feed",
+                source=f"s{rng.randint(0, 30)}",
+                title=f"t{rng.randint(0, 30)}",
+                tags=rng.sample(tags, rng.randint(0, 3)),
+            )
+        elif op < 0.45:
+            call(
+                "store_entries",
+                parsed=make_parsed(*(random_entry() for _ in range(rng.randint(0, 6)))),
+                feed_id=feed_id,
+                epoch_downloaded=step,
+            )
+        elif op < 0.5:
+            call("set_feed_source", feed_id, f"s{rng.randint(0, 30)}")
+        elif op < 0.55:
+            call("set_feed_title", feed_id, f"t{rng.randint(0, 30)}")
+        elif op < 0.6:
+            call("set_feed_tags", feed_id, rng.sample(tags, rng.randint(0, 3)))
+        elif op < 0.62:
+            call("delete_feed", feed_id)
+        elif op < 0.64:
+            call("set_feed_content_hash", feed_id, bytes([step % 256]))
+            call("get_feed_content_hash", feed_id)
+        elif op < 0.66:
+            call(
+                "store_websub_subscription",
+                feed_id=feed_id,
+                hub="h",
+                topic="t",
+                secret="s",
+            )
+            call("set_websub_subscription_expiry", feed_id, step)
+            call(
+                "set_websub_subscription_pending",
+                feed_id,
+                rng.choice([None, step + 10]),
+            )
+        elif op < 0.67:
+            # Moving entries between tiers must not change what is returned.
+            for provider in providers:
+                provider.archive_entries(downloaded_before=step - 200, batch_size=37)
+        else:
+            included_feeds = rng.choice([None, rng.sample(range(1, 26), 3)])
+            included_tags = rng.choice([None, rng.sample(tags, rng.randint(1, 2))])
+            call(
+                "get_entries",
+                limit=rng.randint(-1, 50),
+                offset=rng.randint(-5, 30),
+                included_feeds=included_feeds,
+                included_tags=included_tags,
+                before_id=rng.choice([None, rng.randint(1, 5000)]),
+                after_id=rng.choice([None, None, rng.randint(0, 400)]),
+            )
+            call(
+                "get_entry_count",
+                included_feeds=included_feeds,
+                included_tags=included_tags,
+            )
+            call(
+                "get_feeds",
+                limit=rng.randint(-1, 10),
+                offset=rng.randint(-2, 5),
+                included_feeds=included_feeds,
+                included_tags=included_tags,
+                get_tags=rng.random() < 0.5,
+            )
+            call(
+                "get_feed_count",
+                included_feeds=included_feeds,
+                included_tags=included_tags,
+            )
+            call("get_feed_source", feed_id)
+            call("get_feed_title", feed_id)
+            call("get_feed_tags", feed_id)
+            call("get_websub_subscription", feed_id)
+            call("get_websub_subscribed_feed_ids", active_at=step - 50)
+            call("get_websub_subscriptions_expiring_before", step)
+    for provider in providers:
+        provider.close()
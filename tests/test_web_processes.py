@@ -0,0 +1,72 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import pytest
+import requests
+
+import os
+import signal
+import subprocess
+import time
+
+import tagrss
+
+from .serve_process import run_serve
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork"), reason="--web-processes needs os.fork()"
+)
+
+
+def get_children(pid: int) -> set[int]:
+    result = subprocess.run(
+        ["pgrep", "-P", str(pid)], capture_output=True, text=True, check=False
+    )
+    return {int(line) for line in result.stdout.split()}
+
+
+def test_web_processes(tmp_path):
+    path = tmp_path / "tagrss.db"
+    with run_serve(
+        "--storage-path", str(path), "--web-processes", "3", "--server-threads", "2"
+    ) as (base, process):
+        workers = get_children(process.pid)
+        assert len(workers) == 3
+        for _ in range(10):
+            assert requests.get(f"{base}/", timeout=10).ok
+
+        # A feed added elsewhere is found by whichever worker answers, and
+        # changes to it are picked up within FEED_CACHE_CHECK_SECONDS.
+        storage = tagrss.SqliteStorageProvider(path)
+        feed_id = storage.store_feed(
+            source="https://example.com/a", title="first title", tags=[]
+        )
+        for _ in range(6):
+            response = requests.get(f"{base}/manage_feed?feed={feed_id}", timeout=10)
+            assert "first title" in response.text
+        storage.set_feed_title(feed_id, "second title")
+        storage.close()
+        time.sleep(1.5)
+        for _ in range(6):
+            response = requests.get(f"{base}/manage_feed?feed={feed_id}", timeout=10)
+            assert "second title" in response.text
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=20) == 0
+        for worker in workers:
+            with pytest.raises(ProcessLookupError):
+                os.kill(worker, 0)
+
+
+def test_exits_with_error_when_a_worker_dies(tmp_path):
+    with run_serve(
+        "--storage-path", str(tmp_path / "tagrss.db"), "--web-processes", "2"
+    ) as (_, process):
+        workers = get_children(process.pid)
+        os.kill(workers.pop(), signal.SIGKILL)
+        assert process.wait(timeout=20) == 1
+        for worker in workers:
+            with pytest.raises(ProcessLookupError):
+                os.kill(worker, 0)
@@ -0,0 +1,201 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+import pytest
+import requests
+
+import dataclasses
+import json
+import time
+
+import tagrss
+
+from .serve_process import find_free_port, run_serve
+from .websub_hub import StandInHub
+
+
+@pytest.fixture
+def hub():
+    with StandInHub() as hub:
+        yield hub
+
+
+@pytest.fixture
+def storage():
+    return tagrss.MemoryStorageProvider()
+
+
+@pytest.fixture
+def core(storage):
+    # Nothing listens at the callback base; these tests play the hub's part by
+    # calling TagRss directly.
+    core = tagrss.TagRss(
+        storage_provider=storage,
+        websub_callback_base="http://127.0.0.1:9/",
+        websub_lease_seconds=3600,
+    )
+    yield core
+    core.close()
+
+
+def test_subscribes_to_advertised_hub(core, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    assert request.mode == "subscribe"
+    assert request.topic == hub.feed_url
+    assert request.callback == f"http://127.0.0.1:9/websub/{feed_id}"
+    assert request.secret
+    assert request.lease_seconds == 3600
+
+
+def test_only_verified_subscriptions_skip_polling(core, storage, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    # Until the hub verifies the subscription, the feed must still be polled.
+    assert core.get_websub_subscribed_feed_ids() == set()
+
+    assert not core.verify_websub_intent(
+        feed_id, mode="subscribe", topic="https://example.com/other"
+    )
+    assert core.get_websub_subscribed_feed_ids() == set()
+
+    assert core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=3600
+    )
+    assert core.get_websub_subscribed_feed_ids() == {feed_id}
+
+    # Once the lease runs out, polling resumes.
+    storage.set_websub_subscription_expiry(feed_id, int(time.time()))
+    assert core.get_websub_subscribed_feed_ids() == set()
+
+
+def test_only_requested_subscriptions_can_be_verified(core, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    assert core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=3600
+    )
+    # The subscription is no longer pending, so nobody can change its lease.
+    assert not core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=1
+    )
+    assert core.get_websub_subscribed_feed_ids() == {feed_id}
+
+    core.renew_websub_subscriptions(margin_seconds=2 * 3600)
+    hub.wait_for_requests(2)
+    assert core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=3600
+    )
+
+
+@pytest.mark.parametrize(
+    ("lease_seconds", "expected_lease_seconds"),
+    [(2**64, 3600), (-5, 1), (60, 60)],
+)
+def test_lease_is_clamped(core, storage, hub, lease_seconds, expected_lease_seconds):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    before = int(time.time())
+    assert core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=lease_seconds
+    )
+    subscription = storage.get_websub_subscription(feed_id)
+    assert subscription is not None and subscription.epoch_expires is not None
+    assert (
+        before + expected_lease_seconds
+        <= subscription.epoch_expires
+        <= int(time.time()) + expected_lease_seconds
+    )
+
+
+def test_denied_subscription_is_forgotten(core, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    assert core.verify_websub_intent(feed_id, mode="denied", topic=request.topic)
+    with pytest.raises(tagrss.WebSubSubscriptionDoesNotExistError):
+        core.store_websub_content(feed_id, b"", signature=None)
+
+
+def test_renews_expiring_subscriptions(core, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    core.verify_websub_intent(
+        feed_id, mode="subscribe", topic=request.topic, lease_seconds=3600
+    )
+
+    core.renew_websub_subscriptions(margin_seconds=60)
+    time.sleep(0.2)
+    assert len(hub.requests) == 1
+
+    core.renew_websub_subscriptions(margin_seconds=2 * 3600)
+    renewal = hub.wait_for_requests(2)[1]
+    assert renewal.mode == "subscribe"
+    assert renewal.topic == request.topic
+    assert renewal.callback == request.callback
+    assert renewal.secret == request.secret
+
+
+def test_unverified_subscriptions_are_retried(core, hub):
+    core.add_feed(hub.feed_url, [])
+    hub.wait_for_requests(1)
+    core.renew_websub_subscriptions(margin_seconds=0)
+    assert hub.wait_for_requests(2)[1].mode == "subscribe"
+
+
+def test_deleting_feed_unsubscribes(core, hub):
+    feed_id = core.add_feed(hub.feed_url, [])
+    (request,) = hub.wait_for_requests(1)
+    core.delete_feed(feed_id)
+    unsubscribe = hub.wait_for_requests(2)[1]
+    assert unsubscribe.mode == "unsubscribe"
+    assert unsubscribe.topic == request.topic
+    assert core.verify_websub_intent(feed_id, mode="unsubscribe", topic=request.topic)
+
+
+@pytest.fixture
+def server():
+    port = find_free_port()
+    with run_serve(
+        "--storage-backend",
+        "memory",
+        "--websub-callback-base",
+        f"http://127.0.0.1:{port}",
+        port=port,
+    ) as (base, _):
+        yield base
+
+
+def get_titles(base: str) -> list[str]:
+    response = requests.get(f"{base}/api/entries", timeout=10)
+    return [json.loads(line)["title"] for line in response.text.splitlines()]
+
+
+def test_end_to_end(server, hub):
+    response = requests.post(
+        f"{server}/add_feed",
+        data={"feed_source": hub.feed_url, "tags": "", "title": ""},
+        timeout=10,
+    )
+    assert response.ok
+    (request,) = hub.wait_for_requests(1)
+    assert request.callback.startswith(f"{server}/websub/")
+
+    assert (
+        hub.verify(
+            dataclasses.replace(request, topic="https://example.com/other")
+        ).status_code
+        == 404
+    )
+    # Leases too large for the storage used to cause a 500.
+    response = hub.verify(request, lease_seconds=2**64)
+    assert response.status_code == 200
+    assert response.text == "challenge-token"
+    # Once verified, it can't be verified again until we renew it.
+    assert hub.verify(request).status_code == 404
+
+    assert hub.publish(request, "signed").status_code == 204
+    assert hub.publish(request, "unsigned", sign=False).status_code == 204
+    assert hub.publish(request, "forged", secret="wrong").status_code == 204
+    assert get_titles(server) == ["first", "signed"]
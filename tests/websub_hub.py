@@ -0,0 +1,144 @@
+"""
+Copyright (c) 2023-present Arjun Satarkar <me@arjunsatarkar.net>.
+Licensed under the GNU Affero General Public License v3.0. See LICENSE.txt in
+the root of this repository for the text of the license.
+"""
+# A stand-in WebSub hub and publisher. It serves one Atom feed advertising the
+# hub, records subscription requests, and can verify them and push content to
+# subscribers the way a real hub would.
+import requests
+
+import dataclasses
+import hmac
+import http.server
+import threading
+import typing
+import urllib.parse
+
+
+@dataclasses.dataclass(kw_only=True, slots=True)
+class SubscriptionRequest:
+    mode: str
+    topic: str
+    callback: str
+    secret: typing.Optional[str]
+    lease_seconds: typing.Optional[int]
+
+
+class StandInHub:
+    def __init__(self):
+        self.titles: list[str] = ["first"]
+        self.requests: list[SubscriptionRequest] = []
+        self.__requests_changed = threading.Condition()
+        hub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                content = hub.feed_content()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+                hub.add_request(form)
+                self.send_response(202)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        base = f"http://127.0.0.1:{self.__server.server_address[1]}"
+        self.hub_url = f"{base}/hub"
+        self.feed_url = f"{base}/feed"
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def feed_content(self) -> bytes:
+        entries = "".join(
+            f"<entry><id>urn:entry:{title}</id><title>{title}</title>"
+            f"<link href='https://example.com/{title}'/>"
+            "<updated>2024-01-01T00:00:00Z</updated></entry>"
+            for title in self.titles
+        )
+        return (
+            "<?xml version='1.0' encoding='utf-8'?>"
+            "<feed xmlns='http://www.w3.org/2005/Atom'>"
+            f"<title>Hubbed feed</title><id>urn:feed</id>"
+            f"<link rel='hub' href='{self.hub_url}'/>"
+            f"<link rel='self' href='{self.feed_url}'/>"
+            f"{entries}</feed>"
+        ).encode()
+
+    def add_request(self, form: dict[str, str]) -> None:
+        lease_seconds = form.get("hub.lease_seconds")
+        with self.__requests_changed:
+            self.requests.append(
+                SubscriptionRequest(
+                    mode=form["hub.mode"],
+                    topic=form["hub.topic"],
+                    callback=form["hub.callback"],
+                    secret=form.get("hub.secret"),
+                    lease_seconds=int(lease_seconds) if lease_seconds else None,
+                )
+            )
+            self.__requests_changed.notify_all()
+
+    def wait_for_requests(
+        self, count: int, timeout: float = 10
+    ) -> list[SubscriptionRequest]:
+        with self.__requests_changed:
+            if not self.__requests_changed.wait_for(
+                lambda: len(self.requests) >= count, timeout
+            ):
+                raise TimeoutError(f"Only got {len(self.requests)} hub requests.")
+            return list(self.requests)
+
+    def verify(
+        self, request: SubscriptionRequest, *, lease_seconds: int = 3600
+    ) -> requests.Response:
+        return requests.get(
+            request.callback,
+            params={
+                "hub.mode": request.mode,
+                "hub.topic": request.topic,
+                "hub.challenge": "challenge-token",
+                "hub.lease_seconds": str(lease_seconds),
+            },
+            timeout=10,
+        )
+
+    def publish(
+        self,
+        request: SubscriptionRequest,
+        title: str,
+        *,
+        secret: typing.Optional[str] = None,
+        sign: bool = True,
+    ) -> requests.Response:
+        # Pushes the feed with a new entry to the subscriber, signed with its secret
+        # unless another one is given.
+        self.titles.insert(0, title)
+        content = self.feed_content()
+        headers = {"Content-Type": "application/atom+xml"}
+        if sign:
+            key = (secret if secret is not None else request.secret) or ""
+            digest = hmac.new(key.encode(), content, "sha256").hexdigest()
+            headers["X-Hub-Signature"] = f"sha256={digest}"
+        return requests.post(
+            request.callback, data=content, headers=headers, timeout=10
+        )
@@ -0,0 +1,26 @@
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Backup | TagRSS</title>
+    <link href="/static/styles/main.css" rel="stylesheet">
+</head>
+<body>
+    <a href="/" class="no-visited-indication">&lt; home</a>
+    % if get("result", None):
+        <p><em>Backed up to {{result.path}} in {{f"{result.seconds_total:.3f}"}}s, blocking other requests for {{f"{result.seconds_blocking:.3f}"}}s.</em></p>
+    % end
+    <h1>Backup</h1>
+    <p>Backups are written to {{backup_dir}}.</p>
+    <form method="post">
+        <div>
+            <label>Compress
+                <input type="checkbox" name="compress" {{"checked" if backup_compress else ""}}>
+            </label>
+        </div>
+        <input type="submit" value="Back up now">
+    </form>
+    % include("footer.tpl")
+</body>
+</html>
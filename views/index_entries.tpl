@@ -0,0 +1,40 @@
+% import time
+            % for i, entry in enumerate(entries):
+                <tr>
+                    <td>{{i + 1 + offset}}</td>
+                    <td><a href="{{entry.link}}">{{entry.title}}</a></td>
+                    <%
+                        local_date = ""
+                        utc_date = ""
+                        epoch = entry.epoch_updated
+                        if not epoch:
+                            epoch = entry.epoch_published
+                        end
+                        if epoch:
+                            local_date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch))
+                            utc_date = time.strftime("%Y-%m-%d %H:%M:%SZ", time.gmtime(epoch))
+                        end
+                    %>
+                    <td>
+                        <time datetime="{{utc_date}}">{{local_date}}</time>
+                    </td>
+                    <td class="td-tags">
+                        <div>
+                            % tags = referenced_feeds[entry.feed_id].tags
+                            % for i, tag in enumerate(tags):
+                                % if i > 0:
+                                    {{", "}}
+                                % end
+                                <span class="tag">{{tag}}</span>
+                            % end
+                        </div>
+                    </td>
+                    <td class="td-feed">
+                        <div>
+                            <a href="/manage_feed?feed={{entry.feed_id}}" class="no-visited-indication">⚙</a>
+                            {{referenced_feeds[entry.feed_id].title}}
+                            <small>(</small>{{entry.feed_id}}<small>)</small>
+                        </div>
+                    </td>
+                </tr>
+            % end
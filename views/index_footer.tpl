@@ -0,0 +1,20 @@
+        </tbody>
+    </table>
+    <form>
+        <label>Page
+            <input type="number" value="{{page_num}}" min="1" max="{{total_pages}}" name="page_num">
+        </label> of {{total_pages}}.
+        <label>Per page:
+            <input type="number" value="{{per_page}}" min="1" max="{{max_per_page}}" name="per_page">
+        </label>
+        <input type="submit" value="Go">
+        % if included_feeds:
+            <input type="hidden" name="included_feeds" value="{{included_feeds_str}}">
+        % end
+        % if included_tags:
+            <input type="hidden" name="included_tags" value="{{included_tags_str}}">
+        % end
+    </form>
+    % include("footer.tpl")
+</body>
+</html>
@@ -77,15 +77,15 @@
             %     input_value=included_tags_str if included_tags_str else ""
             % )
             <input type="submit" value="Filter">
-            <input type="hidden" value="{{page_num}}" min="1" max="{{total_pages}}" name="page_num">
-            <input type="hidden" value="{{per_page}}" min="1" max="{{max_per_page}}" name="per_page">
+            <input type="hidden" value="{{page_num}}" name="page_num">
+            <input type="hidden" value="{{per_page}}" name="per_page">
         </form>
         <form>
             <input type="hidden" name="included_feeds" value="">
             <input type="hidden" name="included_tags" value="">
             <input type="submit" value="Clear filters">
-            <input type="hidden" value="{{page_num}}" min="1" max="{{total_pages}}" name="page_num">
-            <input type="hidden" value="{{per_page}}" min="1" max="{{max_per_page}}" name="per_page">
+            <input type="hidden" value="{{page_num}}" name="page_num">
+            <input type="hidden" value="{{per_page}}" name="per_page">
         </form>
     </details>
     <table>
@@ -99,62 +99,3 @@
             </tr>
         </thead>
         <tbody>
-            % for i, entry in enumerate(entries):
-                <tr>
-                    <td>{{i + 1 + offset}}</td>
-                    <td><a href="{{entry.link}}">{{entry.title}}</a></td>
-                    <%
-                        local_date = ""
-                        utc_date = ""
-                        epoch = entry.epoch_updated
-                        if not epoch:
-                            epoch = entry.epoch_published
-                        end
-                        if epoch:
-                            local_date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch))
-                            utc_date = time.strftime("%Y-%m-%d %H:%M:%SZ", time.gmtime(epoch))
-                        end
-                    %>
-                    <td>
-                        <time datetime="{{utc_date}}">{{local_date}}</time>
-                    </td>
-                    <td class="td-tags">
-                        <div>
-                            % tags = referenced_feeds[entry.feed_id].tags
-                            % for i, tag in enumerate(tags):
-                                % if i > 0:
-                                    {{", "}}
-                                % end
-                                <span class="tag">{{tag}}</span>
-                            % end
-                        </div>
-                    </td>
-                    <td class="td-feed">
-                        <div>
-                            <a href="/manage_feed?feed={{entry.feed_id}}" class="no-visited-indication">⚙</a>
-                            {{referenced_feeds[entry.feed_id].title}}
-                            <small>(</small>{{entry.feed_id}}<small>)</small>
-                        </div>
-                    </td>
-                </tr>
-            % end
-        </tbody>
-    </table>
-    <form>
-        <label>Page
-            <input type="number" value="{{page_num}}" min="1" max="{{total_pages}}" name="page_num">
-        </label> of {{total_pages}}.
-        <label>Per page:
-            <input type="number" value="{{per_page}}" min="1" max="{{max_per_page}}" name="per_page">
-        </label>
-        <input type="submit" value="Go">
-        % if included_feeds:
-            <input type="hidden" name="included_feeds" value="{{included_feeds_str}}">
-        % end
-        % if included_tags:
-            <input type="hidden" name="included_tags" value="{{included_tags_str}}">
-        % end
-    </form>
-    % include("footer.tpl")
-</body>
-</html>